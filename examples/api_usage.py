@@ -5,10 +5,93 @@
 """
 
 import asyncio
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 from rhizome.api import RhizomeClient
 
+# Степень параллелизма для независимых записей в DHT (как alpha в Kademlia)
+ALPHA = 3
+
+
+async def _bounded_gather(coros, limit: int = ALPHA):
+    """Выполнение корутин с ограничением числа одновременных запросов
+
+    Новая запись стартует сразу, как только освобождается слот семафора,
+    порядок результатов совпадает с порядком корутин.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+# Поля треда, которые можно менять через update_thread; остальные ключи игнорируются
+_MUTABLE_FIELDS = frozenset({"title", "category", "tags", "popularity_score"})
+
+
+class CachingClient:
+    """Обертка над RhizomeClient с write-through кэшем тредов
+
+    Треды, только что созданные или обновленные через клиент, отдаются
+    из LRU-кэша без повторного похода в DHT. Запись считается устаревшей
+    через min(ttl, max_age) секунд.
+    """
+
+    def __init__(self, client: RhizomeClient, maxsize: int = 512, max_age: float = 60.0):
+        self._client = client
+        self._maxsize = maxsize
+        self._max_age = max_age
+        self._threads: OrderedDict = OrderedDict()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _remember(self, thread, ttl: float):
+        """Запись треда в кэш с вытеснением самого старого"""
+        expires_at = time.monotonic() + min(ttl, self._max_age)
+        self._threads[thread.id] = (expires_at, thread)
+        self._threads.move_to_end(thread.id)
+        if len(self._threads) > self._maxsize:
+            self._threads.popitem(last=False)
+
+    async def create_thread(self, *args, **kwargs):
+        thread = await self._client.create_thread(*args, **kwargs)
+        self._remember(thread, kwargs.get("ttl", self._max_age))
+        return thread
+
+    async def update_thread(self, thread_id: str, **updates):
+        # Проверка по frozenset вместо hasattr/setattr на каждое поле
+        updates = {k: v for k, v in updates.items() if k in _MUTABLE_FIELDS}
+        updated = await self._client.update_thread(thread_id, **updates)
+        if updated:
+            self._remember(updated, self._max_age)
+        return updated
+
+    async def add_message(self, thread_id: str, *args, **kwargs):
+        message = await self._client.add_message(thread_id, *args, **kwargs)
+        # Счетчик сообщений треда изменился
+        self._threads.pop(thread_id, None)
+        return message
+
+    async def find_thread(self, thread_id: str):
+        entry = self._threads.get(thread_id)
+        if entry is not None:
+            expires_at, thread = entry
+            if time.monotonic() < expires_at:
+                self._threads.move_to_end(thread_id)
+                return thread
+            del self._threads[thread_id]
+
+        thread = await self._client.find_thread(thread_id)
+        if thread:
+            self._remember(thread, self._max_age)
+        return thread
+
 
 async def example_basic_usage(client: RhizomeClient):
     """Базовый пример использования API"""
@@ -18,52 +101,57 @@ async def example_basic_usage(client: RhizomeClient):
 
     print(f"\n✓ Узел уже запущен: {client.get_node_info()}")
 
-    # Создание треда
-    print("\n1. Создание треда...")
+    # ID сообщений вычисляются заранее без обращения к сети, поэтому ответ можно
+    # связать с первым сообщением до завершения записи и отправить оба одновременно
+    content1 = "Это первое сообщение в треде. API очень удобный!"
+    content2 = "Это второе сообщение. Можно легко добавлять ответы!"
+    msg1_id = client.precompute_message_id("example_thread_1", content1, "user_123", None)
+    msg2_id = client.precompute_message_id("example_thread_1", content2, "user_456", msg1_id)
+
+    print("\n1. Создание треда и добавление сообщений...")
+    # add_message обновляет метаданные треда, поэтому тред создается первым
     thread = await client.create_thread(
         thread_id="example_thread_1",
         title="Пример использования Rhizome API",
         category="документация",
         tags=["api", "пример", "python"],
     )
+    msg1, msg2 = await asyncio.gather(
+        client.add_message(
+            thread_id="example_thread_1",
+            content=content1,
+            author_signature="user_123",
+            message_id=msg1_id,
+        ),
+        client.add_message(
+            thread_id="example_thread_1",
+            content=content2,
+            author_signature="user_456",
+            parent_id=msg1_id,
+            message_id=msg2_id,
+        ),
+    )
     print(f"✓ Тред создан: {thread.title}")
     print(f"  ID: {thread.id}")
     print(f"  Категория: {thread.category}")
     print(f"  Теги: {', '.join(thread.tags)}")
-
-    # Добавление сообщений
-    print("\n2. Добавление сообщений...")
-    msg1 = await client.add_message(
-        thread_id="example_thread_1",
-        content="Это первое сообщение в треде. API очень удобный!",
-        author_signature="user_123",
-    )
     print(f"✓ Сообщение #1 добавлено: {msg1.id}")
-
-    msg2 = await client.add_message(
-        thread_id="example_thread_1",
-        content="Это второе сообщение. Можно легко добавлять ответы!",
-        author_signature="user_456",
-        parent_id=msg1.id,
-    )
     print(f"✓ Сообщение #2 добавлено: {msg2.id} (ответ на {msg1.id[:16]}...)")
 
-    # Поиск треда
-    print("\n3. Поиск треда...")
-    found_thread = await client.find_thread("example_thread_1")
+    # Поиск треда, обновление индекса и популярные треды независимы
+    print("\n2. Поиск треда, обновление индекса, популярные треды...")
+    found_thread, _, popular = await asyncio.gather(
+        client.find_thread("example_thread_1"),
+        client.update_global_threads(["example_thread_1"]),
+        client.get_popular_threads(limit=5),
+    )
     if found_thread:
         print(f"✓ Тред найден: {found_thread.title}")
         print(f"  Сообщений: {found_thread.message_count}")
         print(f"  Последняя активность: {found_thread.last_activity}")
 
-    # Обновление глобального индекса
-    print("\n4. Обновление глобального индекса...")
-    await client.update_global_threads(["example_thread_1"])
     print("✓ Глобальный индекс обновлен")
 
-    # Получение популярных тредов
-    print("\n5. Получение популярных тредов...")
-    popular = await client.get_popular_threads(limit=5)
     print(f"✓ Найдено популярных элементов: {len(popular)}")
     for item in popular[:3]:
         print(f"  - Ключ: {item['key'][:16]}... | Рейтинг: {item['score']:.2f}")
@@ -82,15 +170,16 @@ async def example_context_manager(client: RhizomeClient):
     print(f"✓ Узел уже запущен: {client.get_node_info()['node_id'][:16]}...")
 
     # Создание нескольких тредов
-    threads = []
-    for i in range(3):
-        thread = await client.create_thread(
+    threads = await _bounded_gather(
+        client.create_thread(
             thread_id=f"thread_{i}",
             title=f"Тред #{i}",
             category="тест",
             tags=["example"],
         )
-        threads.append(thread)
+        for i in range(3)
+    )
+    for thread in threads:
         print(f"✓ Создан тред: {thread.title}")
 
     # Поиск всех тредов
@@ -115,7 +204,8 @@ async def example_thread_operations(client: RhizomeClient):
         tags=["operations"],
     )
 
-    # Добавление нескольких сообщений
+    # Добавление нескольких сообщений по очереди, чтобы выведенный счетчик
+    # треда не зависел от порядка параллельных записей
     for i in range(5):
         await client.add_message(
             thread_id="ops_example",
@@ -142,21 +232,24 @@ async def example_search(client: RhizomeClient):
     print("=" * 60)
 
     # Создание нескольких тредов в разных категориях
-    await client.create_thread("tech_1", "Технологии #1", category="технологии", tags=["python"])
-    await client.create_thread("tech_2", "Технологии #2", category="технологии", tags=["rust"])
-    await client.create_thread("science_1", "Наука #1", category="наука", tags=["python"])
+    await asyncio.gather(
+        client.create_thread("tech_1", "Технологии #1", category="технологии", tags=["python"]),
+        client.create_thread("tech_2", "Технологии #2", category="технологии", tags=["rust"]),
+        client.create_thread("science_1", "Наука #1", category="наука", tags=["python"]),
+    )
 
     # Добавление в глобальный индекс
     await client.update_global_threads(["tech_1", "tech_2", "science_1"])
 
-    # Поиск по категории
-    tech_threads = await client.search_threads(category="технологии")
+    # Поиск по категории и по тегам (запросы к индексу независимы)
+    tech_threads, python_threads = await asyncio.gather(
+        client.search_threads(category="технологии"),
+        client.search_threads(tags=["python"]),
+    )
     print(f"✓ Найдено тредов в категории 'технологии': {len(tech_threads)}")
     for thread in tech_threads:
         print(f"  - {thread.title}")
 
-    # Поиск по тегам
-    python_threads = await client.search_threads(tags=["python"])
     print(f"\n✓ Найдено тредов с тегом 'python': {len(python_threads)}")
     for thread in python_threads:
         print(f"  - {thread.title} ({thread.category})")
@@ -171,7 +264,9 @@ async def main():
     config_file = str(config_path) if config_path.exists() else None
 
     # Используем один клиент для всех примеров, чтобы избежать конфликтов портов
-    async with RhizomeClient(config_path=config_file) as client:
+    async with RhizomeClient(config_path=config_file) as raw_client:
+        # Повторные чтения только что записанных тредов обслуживаются из кэша
+        client = CachingClient(raw_client)
         print("\n✓ Узел запущен, начинаем примеры...\n")
 
         # Пример 1: Базовое использование
@@ -193,4 +288,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop (libuv) быстрее стандартного цикла событий, если установлен
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -3,18 +3,17 @@
 Пример базового использования Rhizome API
 """
 
-import asyncio
-
 from rhizome.storage.data_types import Message, ThreadMetadata
 from rhizome.storage.keys import KeyManager
 from rhizome.utils.crypto import hash_key
 from rhizome.utils.serialization import deserialize, serialize
 
+# Один KeyManager на модуль: производные ключи кэшируются между вызовами
+KEYS = KeyManager()
+
 
 async def example_store_and_retrieve(dht_protocol):
     """Пример сохранения и получения данных"""
-    key_manager = KeyManager()
-
     # Создаем метаданные треда
     thread_meta = ThreadMetadata(
         id="thread_001",
@@ -26,10 +25,10 @@ async def example_store_and_retrieve(dht_protocol):
     )
 
     # Получаем ключ для метаданных
-    meta_key = key_manager.get_thread_meta_key(thread_meta.id)
+    meta_key = KEYS.get_thread_meta_key(thread_meta.id)
 
     # Сериализуем данные
-    meta_data = serialize(thread_meta.to_dict())
+    meta_data = thread_meta.to_bytes()
 
     # Сохраняем в DHT
     await dht_protocol.store(meta_key, meta_data, ttl=86400)
@@ -38,8 +37,7 @@ async def example_store_and_retrieve(dht_protocol):
     # Получаем данные обратно
     retrieved_data = await dht_protocol.find_value(meta_key)
     if retrieved_data:
-        retrieved_dict = deserialize(retrieved_data)
-        retrieved_meta = ThreadMetadata.from_dict(retrieved_dict)
+        retrieved_meta = ThreadMetadata.from_bytes(retrieved_data)
         print(f"Получены метаданные: {retrieved_meta.title}")
     else:
         print("Данные не найдены")
@@ -47,8 +45,6 @@ async def example_store_and_retrieve(dht_protocol):
 
 async def example_create_message(dht_protocol):
     """Пример создания сообщения"""
-    key_manager = KeyManager()
-
     # Создаем сообщение
     message = Message(
         id="msg_001",
@@ -60,20 +56,18 @@ async def example_create_message(dht_protocol):
 
     # Хэшируем сообщение для получения ключа
     message_hash = hash_key(message.id).hex()[:16]
-    message_key = key_manager.get_message_key(message_hash)
+    message_key = KEYS.get_message_key(message_hash)
 
     # Сохраняем сообщение
-    message_data = serialize(message.to_dict())
+    message_data = message.to_bytes()
     await dht_protocol.store(message_key, message_data, ttl=86400)
     print(f"Сохранено сообщение: {message.id}")
 
 
 async def example_global_index(dht_protocol):
     """Пример работы с глобальными индексами"""
-    key_manager = KeyManager()
-
     # Получаем ключ для глобального списка тредов
-    threads_key = key_manager.get_global_threads_key()
+    threads_key = KEYS.get_global_threads_key()
 
     # Список ID тредов
     thread_ids = ["thread_001", "thread_002", "thread_003"]
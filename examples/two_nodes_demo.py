@@ -6,6 +6,9 @@
 """
 
 import asyncio
+import copy
+import signal
+import sys
 import time
 from pathlib import Path
 
@@ -14,7 +17,15 @@ from rhizome.node.full_node import FullNode
 from rhizome.storage.data_types import Message, ThreadMetadata
 from rhizome.storage.keys import KeyManager
 from rhizome.utils.crypto import hash_key
-from rhizome.utils.serialization import deserialize, serialize
+
+# Один KeyManager на модуль: производные ключи кэшируются между вызовами
+KEYS = KeyManager()
+
+# TTL метаданных тредов в секундах
+META_TTL = 86400
+
+# Последние сохраненные метаданные: meta_key -> (время записи по monotonic, ThreadMetadata)
+_last_meta: dict[bytes, tuple[float, ThreadMetadata]] = {}
 
 
 class Colors:
@@ -30,31 +41,103 @@ class Colors:
     BOLD = "\033[1m"
 
 
+class OutputBuffer:
+    """Буфер вывода в терминал
+
+    Строки копятся в памяти и пишутся в stdout одним вызовом на секцию,
+    вместо отдельного print() на каждую строку.
+    """
+
+    def __init__(self, stream=sys.stdout):
+        self._stream = stream
+        self._lines: list[str] = []
+
+    def write(self, line: str):
+        self._lines.append(line)
+
+    def flush(self):
+        if not self._lines:
+            return
+        self._stream.write("\n".join(self._lines) + "\n")
+        self._stream.flush()
+        self._lines.clear()
+
+
+OUT = OutputBuffer()
+
+
 def print_header(text: str):
-    """Красивый заголовок"""
-    print(f"\n{Colors.HEADER}{Colors.BOLD}{'=' * 70}{Colors.END}")
-    print(f"{Colors.HEADER}{Colors.BOLD}{text.center(70)}{Colors.END}")
-    print(f"{Colors.HEADER}{Colors.BOLD}{'=' * 70}{Colors.END}\n")
+    """Красивый заголовок (начало новой секции сбрасывает буфер)"""
+    OUT.flush()
+    OUT.write(f"\n{Colors.HEADER}{Colors.BOLD}{'=' * 70}{Colors.END}")
+    OUT.write(f"{Colors.HEADER}{Colors.BOLD}{text.center(70)}{Colors.END}")
+    OUT.write(f"{Colors.HEADER}{Colors.BOLD}{'=' * 70}{Colors.END}\n")
 
 
 def print_success(text: str):
     """Успешное сообщение"""
-    print(f"{Colors.GREEN}✓ {text}{Colors.END}")
+    OUT.write(f"{Colors.GREEN}✓ {text}{Colors.END}")
 
 
 def print_info(text: str):
     """Информационное сообщение"""
-    print(f"{Colors.CYAN}ℹ {text}{Colors.END}")
+    OUT.write(f"{Colors.CYAN}ℹ {text}{Colors.END}")
 
 
 def print_warning(text: str):
     """Предупреждение"""
-    print(f"{Colors.YELLOW}⚠ {text}{Colors.END}")
+    OUT.write(f"{Colors.YELLOW}⚠ {text}{Colors.END}")
 
 
 def print_error(text: str):
     """Ошибка"""
-    print(f"{Colors.RED}✗ {text}{Colors.END}")
+    OUT.write(f"{Colors.RED}✗ {text}{Colors.END}")
+
+
+def _remember_meta(meta_key: bytes, thread_meta: ThreadMetadata):
+    """Запоминание последней сохраненной версии метаданных треда"""
+    _last_meta[meta_key] = (time.monotonic(), thread_meta)
+
+
+def _cached_meta(meta_key: bytes):
+    """Метаданные из кэша, если их TTL в DHT еще не истек"""
+    entry = _last_meta.get(meta_key)
+    if entry is None:
+        return None
+
+    stored_at, thread_meta = entry
+    if time.monotonic() - stored_at >= META_TTL:
+        del _last_meta[meta_key]
+        return None
+
+    return thread_meta
+
+
+async def _await_peer(node: FullNode, timeout: float = 5) -> bool:
+    """Ожидание появления хотя бы одного узла в routing table"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    while not node.routing_table.get_all_nodes():
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(0.05)
+
+    return True
+
+
+async def _await_replica(node: FullNode, key: bytes, timeout: float = 5):
+    """Ожидание появления значения на узле (экспоненциальный backoff 10мс → 160мс)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.01
+
+    while True:
+        data = await node.find_value(key)
+        if data or loop.time() >= deadline:
+            return data
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.16)
 
 
 async def setup_nodes():
@@ -68,15 +151,18 @@ async def setup_nodes():
         print_info("Создайте config.yaml или скопируйте из примера")
         return None, None
 
+    # YAML разбираем один раз, узлы получают глубокие копии шаблона
+    template = Config.from_file(base_config_path)
+
     # Конфигурация первого узла
-    config1 = Config.from_file(base_config_path)
+    config1 = copy.deepcopy(template)
     config1.network.listen_port = 8468
     config1.node.node_type = "full"
     config1.node.node_id_file = Path("node_id_1.pem")
     config1.storage.data_dir = Path("data_node1")
 
     # Конфигурация второго узла
-    config2 = Config.from_file(base_config_path)
+    config2 = copy.deepcopy(template)
     config2.network.listen_port = 8469
     config2.node.node_type = "full"
     config2.node.node_id_file = Path("node_id_2.pem")
@@ -102,21 +188,25 @@ async def start_nodes(node1: FullNode, node2: FullNode):
     print_header("Запуск узлов")
 
     print_info("Запуск узла 1...")
-    await node1.start()
-    print_success(f"Узел 1 запущен")
+    start1 = asyncio.create_task(node1.start())
+
+    # Узлу 2 нужен только открытый порт узла 1, а не завершенный bootstrap.
+    # Если запуск упал до открытия порта, ожидание вернет False, а start1 - ошибку
+    if not await node1.wait_listening():
+        await start1
+    print_success("Узел 1 слушает порт")
     print_info(f"  Node ID: {node1.node_id.id.hex()[:32]}...")
     print_info(f"  Адрес: {node1.config.network.listen_host}:{node1.config.network.listen_port}")
 
-    await asyncio.sleep(1)  # Даем время на полный запуск
-
     print_info("Запуск узла 2 и подключение к узлу 1...")
-    await node2.start()
+    start2 = asyncio.create_task(node2.start())
+    await asyncio.gather(start1, start2)
     print_success("Узел 2 запущен")
     print_info(f"  Node ID: {node2.node_id.id.hex()[:32]}...")
     print_info(f"  Адрес: {node2.config.network.listen_host}:{node2.config.network.listen_port}")
 
     # Ждем bootstrap
-    await asyncio.sleep(3)
+    await _await_peer(node2)
 
     # Проверяем routing tables
     nodes1 = node1.routing_table.get_all_nodes()
@@ -135,7 +225,6 @@ async def create_threads_on_node1(node1: FullNode):
     """Создание тредов на первом узле"""
     print_header("Создание тредов на узле 1")
 
-    key_manager = KeyManager()
     threads = []
 
     # Создаем несколько тредов
@@ -163,29 +252,35 @@ async def create_threads_on_node1(node1: FullNode):
         },
     ]
 
+    prepared = []
+    now = int(time.time())
     for thread_cfg in thread_configs:
         thread_meta = ThreadMetadata(
             id=thread_cfg["id"],
             title=thread_cfg["title"],
-            created_at=int(time.time()),
+            created_at=now,
             creator_pubkey=f"0x{thread_cfg['creator']}_pubkey",
             category=thread_cfg["category"],
             tags=thread_cfg["tags"],
         )
 
-        meta_key = key_manager.get_thread_meta_key(thread_meta.id)
-        meta_data = serialize(thread_meta.to_dict())
+        meta_key = KEYS.get_thread_meta_key(thread_meta.id)
+        meta_data = thread_meta.to_bytes()
+        prepared.append((thread_meta, meta_key, meta_data))
 
-        success = await node1.store(meta_key, meta_data, ttl=86400)
+    # Записи независимы, поэтому отправляем их одним пакетом
+    results = await node1.store_many(
+        [(meta_key, meta_data, META_TTL) for _, meta_key, meta_data in prepared]
+    )
 
+    for (thread_meta, meta_key, _), success in zip(prepared, results):
         if success:
+            _remember_meta(meta_key, thread_meta)
             print_success(f"Тред '{thread_meta.title}' создан (ID: {thread_meta.id})")
             threads.append(thread_meta)
         else:
             print_error(f"Ошибка создания треда '{thread_meta.title}'")
 
-        await asyncio.sleep(0.5)
-
     return threads
 
 
@@ -193,9 +288,11 @@ async def create_messages_on_node1(node1: FullNode, thread_id: str, count: int =
     """Создание сообщений в треде на первом узле"""
     print_header(f"Создание {count} сообщений в треде '{thread_id}' на узле 1")
 
-    key_manager = KeyManager()
     messages = []
 
+    # Сначала подготавливаем и сериализуем все сообщения
+    prepared = []
+    now = int(time.time())
     for i in range(1, count + 1):
         message = Message(
             id=f"msg_{thread_id}_{i}",
@@ -203,24 +300,27 @@ async def create_messages_on_node1(node1: FullNode, thread_id: str, count: int =
             content=f"Это сообщение #{i} в треде {thread_id}. "
             f"Rhizome - это децентрализованная P2P сеть для обмена данными!",
             author_signature=f"sig_author_{i}",
-            timestamp=int(time.time()) + i,
+            timestamp=now + i,
             content_type="text/markdown",
         )
 
         message_hash = hash_key(message.id).hex()[:16]
-        message_key = key_manager.get_message_key(message_hash)
-        message_data = serialize(message.to_dict())
+        message_key = KEYS.get_message_key(message_hash)
+        message_data = message.to_bytes()
+        prepared.append((message, message_key, message_data))
 
-        success = await node1.store(message_key, message_data, ttl=86400)
+    # Затем отправляем их в DHT одним пакетом
+    results = await node1.store_many(
+        [(message_key, message_data, 86400) for _, message_key, message_data in prepared]
+    )
 
+    for i, ((message, _, _), success) in enumerate(zip(prepared, results), 1):
         if success:
             print_success(f"Сообщение #{i} создано: {message.content[:50]}...")
             messages.append(message)
         else:
             print_error(f"Ошибка создания сообщения #{i}")
 
-        await asyncio.sleep(0.3)
-
     return messages
 
 
@@ -228,14 +328,12 @@ async def find_data_on_node2(node2: FullNode, thread_id: str):
     """Поиск данных на втором узле"""
     print_header(f"Поиск треда '{thread_id}' на узле 2")
 
-    key_manager = KeyManager()
-    meta_key = key_manager.get_thread_meta_key(thread_id)
+    meta_key = KEYS.get_thread_meta_key(thread_id)
 
     try:
         data = await node2.find_value(meta_key)
         if data:
-            thread_dict = deserialize(data)
-            thread_meta = ThreadMetadata.from_dict(thread_dict)
+            thread_meta = ThreadMetadata.from_bytes(data)
 
             print_success("Тред найден на узле 2!")
             print_info(f"  Название: {thread_meta.title}")
@@ -261,26 +359,36 @@ async def update_thread_on_node1(node1: FullNode, thread_id: str):
     new_messages = await create_messages_on_node1(node1, thread_id, count=2)
 
     # Обновляем метаданные треда
-    key_manager = KeyManager()
-    meta_key = key_manager.get_thread_meta_key(thread_id)
+    meta_key = KEYS.get_thread_meta_key(thread_id)
 
     try:
-        data = await node1.find_value(meta_key)
-        if data:
-            thread_dict = deserialize(data)
-            thread_meta = ThreadMetadata.from_dict(thread_dict)
+        # Последняя записанная версия избавляет от лишнего find_value и декодирования.
+        # Меняем копию: кэш должен хранить только то, что реально сохранено
+        thread_meta = _cached_meta(meta_key)
+        if thread_meta is not None:
+            thread_meta = copy.copy(thread_meta)
+        else:
+            data = await node1.find_value(meta_key)
+            if data:
+                thread_meta = ThreadMetadata.from_bytes(data)
 
+        if thread_meta is not None:
             # Обновляем счетчик сообщений и время активности
             # Учитываем уже добавленные сообщения
             current_count = thread_meta.message_count if thread_meta.message_count > 0 else 0
             thread_meta.message_count = current_count + len(new_messages)
-            thread_meta.last_activity = int(time.time())
+            # Время активности берем из уже созданных сообщений, без нового вызова time()
+            if new_messages:
+                thread_meta.last_activity = max(thread_meta.last_activity, new_messages[-1].timestamp)
+            else:
+                thread_meta.last_activity = int(time.time())
 
             # Сохраняем обновленные метаданные
-            updated_data = serialize(thread_meta.to_dict())
-            success = await node1.store(meta_key, updated_data, ttl=86400)
+            updated_data = thread_meta.to_bytes()
+            success = await node1.store(meta_key, updated_data, ttl=META_TTL)
 
             if success:
+                _remember_meta(meta_key, thread_meta)
                 print_success(
                     f"Тред обновлен: добавлено {len(new_messages)} новых сообщений (всего: {thread_meta.message_count})"
                 )
@@ -295,14 +403,25 @@ async def create_global_index(node1: FullNode):
     """Создание глобального индекса тредов"""
     print_header("Создание глобального индекса тредов на узле 1")
 
-    key_manager = KeyManager()
-    threads_key = key_manager.get_global_threads_key()
+    # Нужен только этому шагу, поэтому не загружается при старте демо
+    from rhizome.utils.serialization import deserialize, serialize
+
+    threads_key = KEYS.get_global_threads_key()
 
     # Список всех тредов
     thread_ids = ["thread_p2p", "thread_ai", "thread_crypto"]
 
     threads_data = serialize(thread_ids)
-    success = await node1.store(threads_key, threads_data, ttl=2592000)  # 30 дней
+
+    # Лимит срабатывает на принимающем узле, поэтому при отказе store повторяется
+    # с backoff 50мс → 400мс вместо фиксированной задержки
+    delay = 0.05
+    for _ in range(5):
+        success = await node1.store(threads_key, threads_data, ttl=2592000)  # 30 дней
+        if success:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.4)
 
     if success:
         print_success(f"Глобальный индекс создан с {len(thread_ids)} тредами")
@@ -369,39 +488,66 @@ async def test_replication(node1: FullNode, node2: FullNode, thread_id: str):
     """Тест репликации данных между узлами"""
     print_header(f"Тест репликации треда '{thread_id}'")
 
-    key_manager = KeyManager()
-    meta_key = key_manager.get_thread_meta_key(thread_id)
+    meta_key = KEYS.get_thread_meta_key(thread_id)
+
+    # Чтения независимы: проверяем источник и реплику одновременно
+    print_info("Проверка на узле 1 (источник) и узле 2 (репликация)...")
+    data1, data2 = await asyncio.gather(
+        node1.find_value(meta_key),
+        _await_replica(node2, meta_key),
+        return_exceptions=True,
+    )
 
-    # Проверяем наличие на узле 1
-    print_info("Проверка на узле 1 (источник)...")
-    data1 = await node1.find_value(meta_key)
-    if data1:
+    if data1 and not isinstance(data1, Exception):
         print_success("Данные найдены на узле 1")
     else:
         print_error("Данные не найдены на узле 1")
         return
 
-    # Проверяем наличие на узле 2 (репликация)
-    print_info("Проверка на узле 2 (репликация)...")
-    await asyncio.sleep(1)  # Даем время на репликацию
+    if isinstance(data2, Exception):
+        print_warning(f"Ошибка при поиске на узле 2: {data2}")
+    elif data2:
+        print_success("Данные найдены на узле 2 (репликация работает!)")
 
+        # Сравниваем данные
+        thread1 = ThreadMetadata.from_bytes(data1)
+        thread2 = ThreadMetadata.from_bytes(data2)
+
+        if thread1.id == thread2.id and thread1.title == thread2.title:
+            print_success("Данные идентичны на обоих узлах")
+        else:
+            print_warning("Данные различаются между узлами")
+    else:
+        print_warning("Данные не найдены на узле 2 (репликация еще не завершена)")
+
+
+async def _wait_for_stop():
+    """Ожидание Ctrl+C в текущем цикле событий, без второго asyncio.run"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
     try:
-        data2 = await node2.find_value(meta_key)
-        if data2:
-            print_success("Данные найдены на узле 2 (репликация работает!)")
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+    except NotImplementedError:
+        # На Windows обработчики сигналов в цикле недоступны, ждем KeyboardInterrupt
+        while True:
+            await asyncio.sleep(1)
 
-            # Сравниваем данные
-            thread1 = ThreadMetadata.from_dict(deserialize(data1))
-            thread2 = ThreadMetadata.from_dict(deserialize(data2))
+    try:
+        await stop.wait()
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
 
-            if thread1.id == thread2.id and thread1.title == thread2.title:
-                print_success("Данные идентичны на обоих узлах")
-            else:
-                print_warning("Данные различаются между узлами")
-        else:
-            print_warning("Данные не найдены на узле 2 (репликация еще не завершена)")
-    except Exception as e:
-        print_warning(f"Ошибка при поиске на узле 2: {e}")
+
+async def _stop_nodes(node1: FullNode, node2: FullNode):
+    """Остановка узлов в том же цикле событий"""
+    print_header("Остановка узлов...")
+    if node1:
+        await node1.stop()
+        print_success("Узел 1 остановлен")
+    if node2:
+        await node2.stop()
+        print_success("Узел 2 остановлен")
+    print_header("Все узлы остановлены. До свидания!")
 
 
 async def main():
@@ -421,35 +567,27 @@ async def main():
 
         # 3. Создание тредов на узле 1
         threads = await create_threads_on_node1(node1)
-        await asyncio.sleep(1)
 
         # 4. Создание сообщений в первом треде
         if threads:
             await create_messages_on_node1(node1, threads[0].id, count=3)
-            await asyncio.sleep(1)
 
         # 5. Поиск данных на узле 2
         if threads:
             found_thread = await find_data_on_node2(node2, threads[0].id)
-            await asyncio.sleep(1)
 
         # 6. Обновление треда на узле 1
         if threads:
             await update_thread_on_node1(node1, threads[0].id)
-            await asyncio.sleep(2)  # Даем время на обработку и избегаем rate limit
 
-        # 7. Создание глобального индекса (с задержкой для избежания rate limit)
-        await asyncio.sleep(1)  # Дополнительная задержка перед глобальным индексом
+        # 7. Создание глобального индекса
         await create_global_index(node1)
-        await asyncio.sleep(1)
 
         # 8. Проверка метрик популярности
         await check_popularity_metrics(node1, node2)
-        await asyncio.sleep(1)
 
         # 9. Проверка routing tables
         await check_routing_tables(node1, node2)
-        await asyncio.sleep(1)
 
         # 10. Тест репликации
         if threads:
@@ -458,23 +596,18 @@ async def main():
         print_header("Демонстрация завершена успешно!")
         print_info("Узлы продолжают работать. Нажмите Ctrl+C для остановки.")
         print_info("\nДля остановки узлов нажмите Ctrl+C...\n")
+        OUT.flush()
 
         # Ждем до прерывания
-        while True:
-            await asyncio.sleep(1)
+        await _wait_for_stop()
+        await _stop_nodes(node1, node2)
 
     except KeyboardInterrupt:
-        print_header("Остановка узлов...")
-        if node1:
-            await node1.stop()
-            print_success("Узел 1 остановлен")
-        if node2:
-            await node2.stop()
-            print_success("Узел 2 остановлен")
-        print_header("Все узлы остановлены. До свидания!")
+        await _stop_nodes(node1, node2)
 
     except Exception as e:
         print_error(f"Ошибка: {e}")
+        OUT.flush()
         import traceback
 
         traceback.print_exc()
@@ -483,6 +616,15 @@ async def main():
         if node2:
             await node2.stop()
 
+    finally:
+        OUT.flush()
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop (libuv) быстрее стандартного цикла событий, если установлен
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
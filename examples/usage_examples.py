@@ -4,6 +4,7 @@
 """
 
 import asyncio
+import signal
 import time
 from pathlib import Path
 
@@ -14,13 +15,14 @@ from rhizome.storage.keys import KeyManager
 from rhizome.utils.crypto import hash_key
 from rhizome.utils.serialization import deserialize, serialize
 
+# Один KeyManager на модуль: производные ключи кэшируются между вызовами
+KEYS = KeyManager()
+
 
 async def example_create_thread(node):
     """Пример создания и сохранения треда"""
     print("\n=== Пример: Создание треда ===")
 
-    key_manager = KeyManager()
-
     # Создаем метаданные треда
     thread_meta = ThreadMetadata(
         id="thread_001",
@@ -32,7 +34,7 @@ async def example_create_thread(node):
     )
 
     # Получаем ключ для метаданных
-    meta_key = key_manager.get_thread_meta_key(thread_meta.id)
+    meta_key = KEYS.get_thread_meta_key(thread_meta.id)
 
     # Сериализуем и сохраняем
     meta_data = serialize(thread_meta.to_dict())
@@ -50,8 +52,7 @@ async def example_find_thread(node, thread_id):
     """Пример поиска треда"""
     print(f"\n=== Пример: Поиск треда '{thread_id}' ===")
 
-    key_manager = KeyManager()
-    meta_key = key_manager.get_thread_meta_key(thread_id)
+    meta_key = KEYS.get_thread_meta_key(thread_id)
 
     try:
         data = await node.find_value(meta_key)
@@ -74,8 +75,6 @@ async def example_create_message(node, thread_id):
     """Пример создания сообщения в треде"""
     print(f"\n=== Пример: Создание сообщения в треде '{thread_id}' ===")
 
-    key_manager = KeyManager()
-
     # Создаем сообщение
     message = Message(
         id="msg_001",
@@ -88,7 +87,7 @@ async def example_create_message(node, thread_id):
 
     # Хэшируем ID сообщения для получения ключа
     message_hash = hash_key(message.id).hex()[:16]
-    message_key = key_manager.get_message_key(message_hash)
+    message_key = KEYS.get_message_key(message_hash)
 
     # Сохраняем сообщение
     message_data = serialize(message.to_dict())
@@ -107,10 +106,8 @@ async def example_global_index(node):
     """Пример работы с глобальными индексами"""
     print("\n=== Пример: Глобальный индекс тредов ===")
 
-    key_manager = KeyManager()
-
     # Получаем ключ для глобального списка тредов
-    threads_key = key_manager.get_global_threads_key()
+    threads_key = KEYS.get_global_threads_key()
 
     # Список ID тредов
     thread_ids = ["thread_001", "thread_002", "thread_003"]
@@ -207,9 +204,22 @@ async def main():
         print("Нажмите Ctrl+C для остановки узла")
         print("=" * 60)
 
-        # Ожидание
-        while node.is_running:
-            await asyncio.sleep(1)
+        # Ожидание Ctrl+C в этом же цикле событий: остановка узла не требует второго asyncio.run
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGINT, stop.set)
+        except NotImplementedError:
+            # На Windows обработчики сигналов в цикле недоступны, ждем KeyboardInterrupt
+            while node.is_running:
+                await asyncio.sleep(1)
+        else:
+            await stop.wait()
+            loop.remove_signal_handler(signal.SIGINT)
+
+        print("\n\nОстановка узла...")
+        await node.stop()
+        print("✓ Узел остановлен")
 
     except KeyboardInterrupt:
         print("\n\nОстановка узла...")
@@ -224,4 +234,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop (libuv) быстрее стандартного цикла событий, если установлен
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -40,18 +40,21 @@ mod uniffi_bindgen;
 /// Some help functional for work with serialization and crypto
 pub mod utils;
 
+use futures::stream::{self, StreamExt};
+use std::collections::{HashMap, HashSet};
 use std::path::PathBuf;
 use std::sync::Arc;
-use tokio::sync::RwLock;
-use tokio::time::{Duration, sleep};
+use std::time::Duration;
+use tokio::sync::{Mutex, RwLock};
 
 use crate::config::Config;
 use crate::exceptions::{DHTError, NetworkError, RhizomeError};
 use crate::node::full_node::FullNode;
 use crate::storage::keys::KeyManager;
+use crate::utils::cache::TtlCache;
 use crate::utils::crypto::hash_key;
-use crate::utils::serialization::{deserialize, serialize};
-use crate::utils::time::get_now_i64;
+use crate::utils::serialization::{compress_blob, decompress_blob, from_msgpack, to_msgpack};
+use crate::utils::time::{get_now_i64, get_now_ms_i64};
 
 #[derive(uniffi::Record, serde::Serialize, serde::Deserialize, Clone, Debug)]
 pub struct ThreadMetadataBridge {
@@ -78,6 +81,15 @@ pub struct MessageBridge {
     pub attachments: Vec<String>,
 }
 
+/// TTL of thread metadata updated by the client
+const THREAD_META_TTL: i32 = 86400;
+/// Max count of threads and messages kept in client caches
+const CACHE_SIZE: usize = 1024;
+/// How long cached thread or message is trusted without DHT lookup
+const CACHE_TTL: Duration = Duration::from_secs(300);
+/// Count of locks which serialize read-modify-write of thread metadata
+const META_LOCKS: usize = 64;
+
 #[derive(uniffi::Object)]
 pub struct RhizomeClient {
     // Оборачиваем внутреннее состояние для возможности работы через &self
@@ -88,30 +100,163 @@ struct ClientInner {
     pub config: Config,
     pub node: Option<Arc<FullNode>>,
     pub key_manager: KeyManager,
+    pub thread_index: RwLock<ThreadIndex>,
+    /// Last known metadata of threads touched by this client
+    pub thread_cache: Mutex<TtlCache<String, ThreadMetadataBridge>>,
+    /// Recently written or found messages
+    pub message_cache: Mutex<TtlCache<String, MessageBridge>>,
+    /// Striped by thread id, holder owns metadata of the thread until its store ends
+    pub meta_locks: Vec<Mutex<()>>,
     pub is_running: bool,
 }
 
+impl ClientInner {
+    /// Lock of the thread metadata, same thread always gets the same lock
+    fn meta_lock(&self, thread_id: &str) -> &Mutex<()> {
+        let hash = hash_key(thread_id.as_bytes());
+        &self.meta_locks[hash[0] as usize % self.meta_locks.len()]
+    }
+}
+
+/// Secondary index of known threads by category and tags
+#[derive(Default)]
+struct ThreadIndex {
+    /// Category -> thread ids
+    by_category: HashMap<String, HashSet<String>>,
+    /// Tag -> thread ids
+    by_tag: HashMap<String, HashSet<String>>,
+    /// Thread id -> indexed category and tags (for reindex on update)
+    entries: HashMap<String, (Option<String>, Vec<String>)>,
+}
+
+impl ThreadIndex {
+    /// Add thread in index or replace its old category and tags
+    fn insert(&mut self, meta: &ThreadMetadataBridge) {
+        self.remove(&meta.id);
+
+        if let Some(category) = &meta.category {
+            self.by_category
+                .entry(category.clone())
+                .or_default()
+                .insert(meta.id.clone());
+        }
+        for tag in &meta.tags {
+            self.by_tag
+                .entry(tag.clone())
+                .or_default()
+                .insert(meta.id.clone());
+        }
+
+        self.entries
+            .insert(meta.id.clone(), (meta.category.clone(), meta.tags.clone()));
+    }
+
+    /// Remove thread from all index sets
+    fn remove(&mut self, thread_id: &str) {
+        let Some((category, tags)) = self.entries.remove(thread_id) else {
+            return;
+        };
+
+        if let Some(category) = category
+            && let Some(ids) = self.by_category.get_mut(&category)
+        {
+            ids.remove(thread_id);
+            if ids.is_empty() {
+                self.by_category.remove(&category);
+            }
+        }
+        for tag in tags {
+            if let Some(ids) = self.by_tag.get_mut(&tag) {
+                ids.remove(thread_id);
+                if ids.is_empty() {
+                    self.by_tag.remove(&tag);
+                }
+            }
+        }
+    }
+
+    fn contains(&self, thread_id: &str) -> bool {
+        self.entries.contains_key(thread_id)
+    }
+
+    /// Ids of threads which have the category and all tags
+    ///
+    /// Intersection starts from the smallest set
+    fn query(&self, category: Option<&str>, tags: &[String]) -> Vec<String> {
+        let mut sets: Vec<&HashSet<String>> = Vec::with_capacity(tags.len() + 1);
+
+        if let Some(category) = category {
+            match self.by_category.get(category) {
+                Some(ids) => sets.push(ids),
+                None => return Vec::new(),
+            }
+        }
+        for tag in tags {
+            match self.by_tag.get(tag) {
+                Some(ids) => sets.push(ids),
+                None => return Vec::new(),
+            }
+        }
+
+        sets.sort_by_key(|ids| ids.len());
+        match sets.split_first() {
+            Some((smallest, rest)) => smallest
+                .iter()
+                .filter(|id| rest.iter().all(|ids| ids.contains(*id)))
+                .cloned()
+                .collect(),
+            None => self.entries.keys().cloned().collect(),
+        }
+    }
+}
+
+/// Check that thread fits search filters
+fn thread_matches(meta: &ThreadMetadataBridge, category: Option<&str>, tags: &[String]) -> bool {
+    category.is_none_or(|c| meta.category.as_deref() == Some(c))
+        && tags.iter().all(|tag| meta.tags.contains(tag))
+}
+
+/// Message id as hash of its fields, creation time and random nonce
+///
+/// Identical content posted twice gets two ids, so the second store never
+/// overwrites the first one
+fn new_message_id(
+    thread_id: &str,
+    parent_id: Option<&str>,
+    author_signature: Option<&str>,
+    content: &str,
+    now_ms: i64,
+) -> String {
+    let nonce: u64 = rand::random();
+    let material = format!(
+        "{}\0{}\0{}\0{}\0{}\0{}",
+        thread_id,
+        parent_id.unwrap_or_default(),
+        author_signature.unwrap_or_default(),
+        content,
+        now_ms,
+        nonce
+    );
+    format!("msg_{}", hex::encode(&hash_key(material.as_bytes())[..16]))
+}
+
 /// API client for work with protocol
 #[uniffi::export]
 impl RhizomeClient {
     #[uniffi::constructor]
     pub fn new(config_path: Option<String>) -> Arc<Self> {
-        let final_config = if let Some(path) = config_path {
-            Config::from_file(Some(PathBuf::from(path)))
-        } else {
-            let default_path = PathBuf::from("config.yaml");
-            if default_path.exists() {
-                Config::from_file(Some(default_path))
-            } else {
-                Config::from_file(None)
-            }
-        };
+        // Без пути `from_file` сам берет `config.yaml` или значения по умолчанию
+        let final_config = Config::from_file(config_path.map(PathBuf::from));
 
         Arc::new(Self {
             inner: Arc::new(RwLock::new(ClientInner {
                 config: final_config,
                 node: None,
                 key_manager: KeyManager::new(),
+                thread_index: RwLock::new(ThreadIndex::default()),
+                thread_cache: Mutex::new(TtlCache::new(CACHE_SIZE, CACHE_TTL)),
+                message_cache: Mutex::new(TtlCache::new(CACHE_SIZE, CACHE_TTL)),
+                meta_locks: (0..META_LOCKS).map(|_| Mutex::new(())).collect(),
                 is_running: false,
             })),
         })
@@ -136,7 +281,6 @@ impl RhizomeClient {
         inner.node = Some(node_arc);
         inner.is_running = true;
 
-        sleep(Duration::from_secs(1)).await;
         Ok(())
     }
 
@@ -171,40 +315,110 @@ impl RhizomeClient {
         let creator = creator_pubkey
             .unwrap_or_else(|| format!("0x{}", hex::encode(&hash_key(thread_id.as_bytes())[..8])));
 
+        let now = get_now_i64();
         let thread_meta = ThreadMetadataBridge {
             id: thread_id.clone(),
             title,
-            created_at: get_now_i64(),
+            created_at: now,
             creator_pubkey: creator,
             category,
             tags: tags.unwrap_or_default(),
             message_count: 0,
-            last_activity: get_now_i64(),
+            last_activity: now,
             popularity_score: 0.0,
         };
 
         let meta_key = inner.key_manager.get_thread_meta_key(&thread_id);
         let meta_data =
-            serialize(&thread_meta, "msgpack").map_err(|_| RhizomeError::Dht(DHTError::General))?;
+            to_msgpack(&thread_meta).map_err(|_| RhizomeError::Dht(DHTError::General))?;
         node.store(&meta_key, &meta_data, ttl).await?;
+        inner.thread_index.write().await.insert(&thread_meta);
+        inner
+            .thread_cache
+            .lock()
+            .await
+            .insert(thread_id.clone(), thread_meta.clone());
 
         // Обновление индекса
         let threads_key = inner.key_manager.get_global_threads_key();
-        let mut thread_list: Vec<String> = match node.find_value(&threads_key).await {
-            Ok(data) => deserialize(&data, "msgpack").unwrap_or_default(),
-            Err(_) => Vec::new(),
-        };
-
-        if !thread_list.contains(&thread_id) {
-            thread_list.push(thread_id);
-            let list_data = serialize(&thread_list, "msgpack")
-                .map_err(|_| RhizomeError::Dht(DHTError::General))?;
+        let list_raw = node.find_value(&threads_key).await.unwrap_or_default();
+        let list_bytes = decompress_blob(&list_raw).unwrap_or_default();
+        // Id строк заимствуются из буфера, без выделения String на каждый тред
+        let mut thread_list: Vec<&str> = from_msgpack(&list_bytes).unwrap_or_default();
+
+        if !thread_list.contains(&thread_id.as_str()) {
+            thread_list.push(&thread_id);
+            // Большой индекс сжимается, чтобы каждая реплика передавала меньше байт
+            let list_data = compress_blob(
+                to_msgpack(&thread_list).map_err(|_| RhizomeError::Dht(DHTError::General))?,
+            );
             node.store(&threads_key, &list_data, 86400).await?;
         }
 
         Ok(thread_meta)
     }
 
+    /// Update thread metadata, only given fields are changed
+    ///
+    /// Last known metadata is taken from the cache, so a hot thread costs one store
+    #[uniffi::method(default(title = None, category = None, tags = None, popularity_score = None))]
+    pub async fn update_thread(
+        &self,
+        thread_id: String,
+        title: Option<String>,
+        category: Option<String>,
+        tags: Option<Vec<String>>,
+        popularity_score: Option<f64>,
+    ) -> Result<Option<ThreadMetadataBridge>, RhizomeError> {
+        let inner = self.inner.read().await;
+        let node = inner
+            .node
+            .as_ref()
+            .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
+
+        let _meta_guard = inner.meta_lock(&thread_id).lock().await;
+        let cached_meta = inner.thread_cache.lock().await.get(&thread_id).cloned();
+        let mut meta = match cached_meta {
+            Some(meta) => meta,
+            None => match Self::fetch_thread(node, &inner.key_manager, &thread_id).await? {
+                Some(meta) => meta,
+                None => return Ok(None),
+            },
+        };
+
+        let reindex = category.is_some() || tags.is_some();
+        if let Some(title) = title {
+            meta.title = title;
+        }
+        if category.is_some() {
+            meta.category = category;
+        }
+        if let Some(tags) = tags {
+            meta.tags = tags;
+        }
+        if let Some(score) = popularity_score {
+            meta.popularity_score = score;
+        }
+        meta.last_activity = meta.last_activity.max(get_now_i64());
+
+        let meta_key = inner.key_manager.get_thread_meta_key(&thread_id);
+        let meta_data = to_msgpack(&meta).map_err(|_| RhizomeError::Dht(DHTError::General))?;
+        node.store(&meta_key, &meta_data, THREAD_META_TTL).await?;
+
+        if reindex || !inner.thread_index.read().await.contains(&thread_id) {
+            inner.thread_index.write().await.insert(&meta);
+        }
+        inner
+            .thread_cache
+            .lock()
+            .await
+            .insert(thread_id, meta.clone());
+
+        Ok(Some(meta))
+    }
+
+    #[allow(clippy::too_many_arguments)]
+    #[uniffi::method(default(message_id = None))]
     pub async fn add_message(
         &self,
         thread_id: String,
@@ -213,6 +427,7 @@ impl RhizomeClient {
         parent_id: Option<String>,
         content_type: String,
         ttl: i32,
+        message_id: Option<String>,
     ) -> Result<MessageBridge, RhizomeError> {
         let inner = self.inner.read().await;
         let node = inner
@@ -220,13 +435,23 @@ impl RhizomeClient {
             .as_ref()
             .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
 
-        let timestamp = get_now_i64();
-        let message_id = format!("msg_{}_{}", thread_id, timestamp);
-
-        let signature = author_signature.unwrap_or_else(|| {
-            format!("sig_{}", hex::encode(&hash_key(message_id.as_bytes())[..8]))
+        // Одно чтение часов на запрос: миллисекунды для id, секунды для меток
+        let now_ms = get_now_ms_i64();
+        let timestamp = now_ms / 1000;
+        let message_id = message_id.unwrap_or_else(|| {
+            new_message_id(
+                &thread_id,
+                parent_id.as_deref(),
+                author_signature.as_deref(),
+                &content,
+                now_ms,
+            )
         });
 
+        let id_hash = hash_key(message_id.as_bytes());
+        let signature =
+            author_signature.unwrap_or_else(|| format!("sig_{}", hex::encode(&id_hash[..8])));
+
         let message = MessageBridge {
             id: message_id.clone(),
             thread_id: thread_id.clone(),
@@ -238,17 +463,218 @@ impl RhizomeClient {
             attachments: vec![],
         };
 
-        let message_hash = hex::encode(&hash_key(message_id.as_bytes())[..8]);
-        let message_key = inner.key_manager.get_message_key(&message_hash);
+        let message_key = inner.key_manager.get_message_key_bytes(&id_hash[..8]);
         let message_data =
-            serialize(&message, "msgpack").map_err(|_| RhizomeError::Dht(DHTError::General))?;
+            to_msgpack(&message).map_err(|_| RhizomeError::Dht(DHTError::General))?;
+
+        // Счетчики треда обновляются локально, без повторного чтения из DHT.
+        // Блокировка треда держится до конца store, иначе параллельные вызовы
+        // могут записать устаревший счетчик поверх нового
+        let update_meta = async {
+            let _meta_guard = inner.meta_lock(&thread_id).lock().await;
+            let cached_meta = inner.thread_cache.lock().await.get(&thread_id).cloned();
+            let known_meta = match cached_meta {
+                Some(meta) => Some(meta),
+                None => Self::fetch_thread(node, &inner.key_manager, &thread_id).await?,
+            };
+            let Some(mut meta) = known_meta else {
+                return Ok(());
+            };
+            meta.message_count += 1;
+            meta.last_activity = meta.last_activity.max(timestamp);
+
+            let meta_key = inner.key_manager.get_thread_meta_key(&thread_id);
+            let meta_data = to_msgpack(&meta).map_err(|_| RhizomeError::Dht(DHTError::General))?;
+            node.store(&meta_key, &meta_data, THREAD_META_TTL).await?;
+
+            // В кэш попадает только сохраненный счетчик
+            inner
+                .thread_cache
+                .lock()
+                .await
+                .insert(thread_id.clone(), meta);
+            Ok::<(), RhizomeError>(())
+        };
 
-        node.store(&message_key, &message_data, ttl).await?;
+        let (message_stored, meta_stored) =
+            tokio::join!(node.store(&message_key, &message_data, ttl), update_meta);
+        message_stored?;
+        meta_stored?;
+
+        inner
+            .message_cache
+            .lock()
+            .await
+            .insert(message_id, message.clone());
 
-        // Здесь мы бы вызвали update_thread, но для краткости опустим (логика аналогична)
         Ok(message)
     }
 
+    /// Message id computed without any I/O, same scheme as default id of `add_message`
+    ///
+    /// Pass it to `add_message` to reference a message (e.g. as `parent_id`)
+    /// before its store completes. Every call returns a new id
+    pub fn precompute_message_id(
+        &self,
+        thread_id: String,
+        content: String,
+        author_signature: Option<String>,
+        parent_id: Option<String>,
+    ) -> String {
+        new_message_id(
+            &thread_id,
+            parent_id.as_deref(),
+            author_signature.as_deref(),
+            &content,
+            get_now_ms_i64(),
+        )
+    }
+
+    /// Find thread metadata by id
+    pub async fn find_thread(
+        &self,
+        thread_id: String,
+    ) -> Result<Option<ThreadMetadataBridge>, RhizomeError> {
+        let inner = self.inner.read().await;
+        let node = inner
+            .node
+            .as_ref()
+            .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
+
+        if let Some(meta) = inner.thread_cache.lock().await.get(&thread_id) {
+            return Ok(Some(meta.clone()));
+        }
+
+        let thread = Self::fetch_thread(node, &inner.key_manager, &thread_id).await?;
+        if let Some(meta) = &thread {
+            inner.thread_index.write().await.insert(meta);
+            inner
+                .thread_cache
+                .lock()
+                .await
+                .insert(meta.id.clone(), meta.clone());
+        }
+        Ok(thread)
+    }
+
+    /// Find message by id
+    pub async fn find_message(
+        &self,
+        message_id: String,
+    ) -> Result<Option<MessageBridge>, RhizomeError> {
+        let inner = self.inner.read().await;
+        let node = inner
+            .node
+            .as_ref()
+            .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
+
+        if let Some(message) = inner.message_cache.lock().await.get(&message_id) {
+            return Ok(Some(message.clone()));
+        }
+
+        let message_key = inner.key_manager.get_message_key_by_id(&message_id);
+        let message: MessageBridge = match node.find_value(&message_key).await {
+            Ok(data) => from_msgpack(&data).map_err(|_| RhizomeError::Dht(DHTError::General))?,
+            Err(RhizomeError::Dht(DHTError::ValueNotFound)) => return Ok(None),
+            Err(e) => return Err(e),
+        };
+
+        inner
+            .message_cache
+            .lock()
+            .await
+            .insert(message_id, message.clone());
+        Ok(Some(message))
+    }
+
+    /// Search threads by category and tags
+    ///
+    /// Threads from the global list are indexed once, then every search is
+    /// a set intersection and only matching metadata is fetched from DHT
+    pub async fn search_threads(
+        &self,
+        category: Option<String>,
+        tags: Option<Vec<String>>,
+    ) -> Result<Vec<ThreadMetadataBridge>, RhizomeError> {
+        let inner = self.inner.read().await;
+        let node = inner
+            .node
+            .as_ref()
+            .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
+        let tags = tags.unwrap_or_default();
+
+        let threads_key = inner.key_manager.get_global_threads_key();
+        let list_raw = node.find_value(&threads_key).await.unwrap_or_default();
+        let list_bytes = decompress_blob(&list_raw).unwrap_or_default();
+        let thread_list: Vec<&str> = from_msgpack(&list_bytes).unwrap_or_default();
+
+        // String выделяется только для тредов, которых еще нет в индексе
+        let unknown: Vec<String> = {
+            let index = inner.thread_index.read().await;
+            thread_list
+                .into_iter()
+                .filter(|id| !index.contains(id))
+                .map(str::to_owned)
+                .collect()
+        };
+        let mut fetched: HashMap<String, ThreadMetadataBridge> =
+            Self::fetch_threads(node, &inner.key_manager, &unknown)
+                .await
+                .into_iter()
+                .map(|meta| (meta.id.clone(), meta))
+                .collect();
+
+        let ids = {
+            let mut index = inner.thread_index.write().await;
+            for meta in fetched.values() {
+                index.insert(meta);
+            }
+            index.query(category.as_deref(), &tags)
+        };
+
+        let missing: Vec<String> = {
+            let mut cache = inner.thread_cache.lock().await;
+            for meta in fetched.values() {
+                cache.insert(meta.id.clone(), meta.clone());
+            }
+
+            let mut missing = Vec::new();
+            for id in &ids {
+                if fetched.contains_key(id) {
+                    continue;
+                }
+                match cache.get(id) {
+                    Some(meta) => {
+                        fetched.insert(id.clone(), meta.clone());
+                    }
+                    None => missing.push(id.clone()),
+                }
+            }
+            missing
+        };
+        let refreshed = Self::fetch_threads(node, &inner.key_manager, &missing).await;
+        {
+            let mut cache = inner.thread_cache.lock().await;
+            for meta in refreshed {
+                cache.insert(meta.id.clone(), meta.clone());
+                fetched.insert(meta.id.clone(), meta);
+            }
+        }
+
+        let mut index = inner.thread_index.write().await;
+        let mut result = Vec::with_capacity(ids.len());
+        for id in ids {
+            if let Some(meta) = fetched.remove(&id) {
+                index.insert(&meta);
+                if thread_matches(&meta, category.as_deref(), &tags) {
+                    result.push(meta);
+                }
+            }
+        }
+
+        Ok(result)
+    }
+
     // Для API используем String (JSON), так как UniFFI не поддерживает динамический Value
     pub async fn get_popular_threads_json(&self, limit: u32) -> Result<String, RhizomeError> {
         let inner = self.inner.read().await;
@@ -257,29 +683,27 @@ impl RhizomeClient {
             .as_ref()
             .ok_or(RhizomeError::Dht(DHTError::NodeNotFound))?;
 
-        let all_metrics = node
-            .metrics_collector
-            .read()
-            .await
-            .get_all_metrics()
-            .clone();
-        let ranked = node
-            .popularity_ranker
-            .rank_items(&all_metrics, Some(limit as usize));
-
-        let result = serde_json::json!(
-            ranked
-                .iter()
-                .map(|item| {
-                    serde_json::json!({
-                        "key": hex::encode(&item.key),
-                        "score": item.score
-                    })
-                })
-                .collect::<Vec<_>>()
-        );
-
-        Ok(result.to_string())
+        let ranked = {
+            let collector = node.metrics_collector.read().await;
+            collector.get_top(&node.popularity_ranker, limit as usize)
+        };
+
+        // Пишем JSON напрямую, без промежуточного дерева serde_json::Value на каждый элемент
+        #[derive(serde::Serialize)]
+        struct PopularEntry {
+            key: String,
+            score: f64,
+        }
+
+        let entries: Vec<PopularEntry> = ranked
+            .into_iter()
+            .map(|item| PopularEntry {
+                key: hex::encode(&item.key),
+                score: item.score,
+            })
+            .collect();
+
+        serde_json::to_string(&entries).map_err(|_| RhizomeError::Dht(DHTError::General))
     }
 
     pub async fn get_node_info_json(&self) -> String {
@@ -297,3 +721,44 @@ impl RhizomeClient {
         }
     }
 }
+
+impl RhizomeClient {
+    /// Load thread metadata from DHT, `None` if it is not stored anywhere
+    async fn fetch_thread(
+        node: &FullNode,
+        key_manager: &KeyManager,
+        thread_id: &str,
+    ) -> Result<Option<ThreadMetadataBridge>, RhizomeError> {
+        let meta_key = key_manager.get_thread_meta_key(thread_id);
+        match node.find_value(&meta_key).await {
+            Ok(data) => from_msgpack(&data)
+                .map(Some)
+                .map_err(|_| RhizomeError::Dht(DHTError::General)),
+            Err(RhizomeError::Dht(DHTError::ValueNotFound)) => Ok(None),
+            Err(e) => Err(e),
+        }
+    }
+
+    /// Load metadata of many threads with a sliding window of lookups
+    ///
+    /// Every lookup already queries `alpha` peers, so up to `alpha * 4`
+    /// lookups are in flight and a new one starts as soon as any finishes.
+    /// Result order is not kept
+    async fn fetch_threads(
+        node: &FullNode,
+        key_manager: &KeyManager,
+        thread_ids: &[String],
+    ) -> Vec<ThreadMetadataBridge> {
+        let concurrency = (node.config.dht.alpha.max(1) as usize) * 4;
+
+        stream::iter(
+            thread_ids
+                .iter()
+                .map(|id| Self::fetch_thread(node, key_manager, id)),
+        )
+        .buffer_unordered(concurrency)
+        .filter_map(|result| futures::future::ready(result.ok().flatten()))
+        .collect()
+        .await
+    }
+}
@@ -8,10 +8,33 @@
 //! - **Serde Integration**: Uses `serde` for seamless serialization/deserialization to/from YAML.
 //! - **Partial Configuration**: Supports loading incomplete YAML files by providing sensible defaults for missing fields.
 
+use serde::de::DeserializeOwned;
+use serde::de::value::{Error as ValueError, MapDeserializer};
 use serde::{Deserialize, Serialize};
+use std::collections::HashMap;
 use std::env;
 use std::fs;
 use std::path::PathBuf;
+use std::sync::{LazyLock, Mutex, Once};
+use std::time::SystemTime;
+
+/// Parsed YAML files: path -> (modification time, config before env overrides)
+type ParsedConfigs = HashMap<PathBuf, (Option<SystemTime>, Config)>;
+
+/// Repeated loads of an unchanged file cost one `stat` instead of a YAML parse.
+static PARSED_CONFIGS: LazyLock<Mutex<ParsedConfigs>> =
+    LazyLock::new(|| Mutex::new(HashMap::new()));
+
+/// `.env` is read once per process
+static DOTENV: Once = Once::new();
+
+/// Builds a value from an empty map, so every field takes its serde default.
+/// Same result as parsing `{}` as YAML, without running the YAML parser.
+fn from_defaults<T: DeserializeOwned>() -> T {
+    let empty = std::iter::empty::<(&str, &str)>();
+    T::deserialize(MapDeserializer::<_, ValueError>::new(empty))
+        .expect("all config fields have serde defaults")
+}
 
 // --- Default Value Providers ---
 // These functions provide default values for Serde when a field is missing in the YAML file.
@@ -141,7 +164,7 @@ pub struct DHTConfig {
 
 impl Default for DHTConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -173,7 +196,7 @@ pub struct StorageConfig {
 
 impl Default for StorageConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -199,7 +222,7 @@ pub struct NetworkConfig {
 
 impl Default for NetworkConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -222,7 +245,7 @@ pub struct NodeConfig {
 
 impl Default for NodeConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -248,7 +271,7 @@ pub struct PopularityConfig {
 
 impl Default for PopularityConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -280,7 +303,7 @@ pub struct SecurityConfig {
 
 impl Default for SecurityConfig {
     fn default() -> Self {
-        serde_yaml::from_str("{}").unwrap()
+        from_defaults()
     }
 }
 
@@ -317,15 +340,16 @@ impl Config {
     ///
     /// * `config_path` - Optional path to the YAML file. Defaults to `config.yaml`.
     pub fn from_file(config_path: Option<PathBuf>) -> Self {
-        let _ = dotenvy::dotenv();
+        DOTENV.call_once(|| {
+            let _ = dotenvy::dotenv();
+        });
 
         let path = config_path.unwrap_or_else(|| PathBuf::from("config.yaml"));
 
         let mut config: Config = if path.exists() {
-            let content = fs::read_to_string(path).unwrap_or_default();
-            serde_yaml::from_str(&content).unwrap_or_else(|_| serde_yaml::from_str("{}").unwrap())
+            Self::parse_cached(path)
         } else {
-            serde_yaml::from_str("{}").unwrap()
+            from_defaults()
         };
 
         if let Ok(env_level) = env::var("LOG_LEVEL") {
@@ -335,6 +359,24 @@ impl Config {
         config
     }
 
+    /// Returns the parsed YAML file, reusing the previous parse while the file is unchanged.
+    fn parse_cached(path: PathBuf) -> Self {
+        let modified = fs::metadata(&path).and_then(|m| m.modified()).ok();
+
+        let mut parsed = PARSED_CONFIGS.lock().unwrap_or_else(|e| e.into_inner());
+        if let Some((cached_modified, config)) = parsed.get(&path)
+            && modified.is_some()
+            && *cached_modified == modified
+        {
+            return config.clone();
+        }
+
+        let content = fs::read_to_string(&path).unwrap_or_default();
+        let config: Config = serde_yaml::from_str(&content).unwrap_or_else(|_| from_defaults());
+        parsed.insert(path, (modified, config.clone()));
+        config
+    }
+
     /// Persists the current configuration state to a YAML file.
     ///
     /// # Errors
@@ -1,11 +1,15 @@
 use std::fmt;
 use std::hash::{Hash, Hasher};
+use std::time::Instant;
 
-use crate::utils::crypto::compute_distance;
-use crate::utils::time::get_now_f64;
+/// XOR-distance as big-endian `u128` and `u32` words
+///
+/// Tuples compare in the same order as the `distance_to` bytes, but with two integer
+/// comparisons instead of a byte-wise one
+pub type Distance = (u128, u32);
 
 /// 160-bits node identifier for Kademlia DHT Network
-#[derive(Clone, Copy, PartialEq, Eq, Hash)]
+#[derive(Clone, Copy, PartialEq, Eq)]
 pub struct NodeID(pub [u8; 20]);
 
 impl NodeID {
@@ -15,12 +19,41 @@ impl NodeID {
     }
 
     /// Calculate XOR-distance between nodes
+    ///
+    /// Works on fixed arrays, so unlike `compute_distance` it does not allocate
+    #[inline]
     pub fn distance_to(&self, other: &NodeID) -> [u8; 20] {
-        let dist_vec = compute_distance(&self.0, &other.0);
         let mut res = [0u8; 20];
-        res.copy_from_slice(&dist_vec[..20]);
+        for (r, (a, b)) in res.iter_mut().zip(self.0.iter().zip(other.0.iter())) {
+            *r = a ^ b;
+        }
         res
     }
+
+    /// XOR-distance in the word form, cheap key for sorting and ordered maps
+    #[inline]
+    pub fn distance_key(&self, other: &NodeID) -> Distance {
+        let (a_high, a_low) = self.words();
+        let (b_high, b_low) = other.words();
+        (a_high ^ b_high, a_low ^ b_low)
+    }
+
+    #[inline]
+    fn words(&self) -> Distance {
+        let (high, low) = self.0.split_at(16);
+        (
+            u128::from_be_bytes(high.try_into().expect("20-bytes node id")),
+            u32::from_be_bytes(low.try_into().expect("20-bytes node id")),
+        )
+    }
+}
+
+/// Id has fixed size, so it is hashed as one 20-bytes write
+/// without the length prefix of the derived slice hashing
+impl Hash for NodeID {
+    fn hash<H: Hasher>(&self, state: &mut H) {
+        state.write(&self.0);
+    }
 }
 
 /// Create beautiful output on Debug mode
@@ -41,8 +74,8 @@ pub struct Node {
     pub address: String,
     /// Address port _(exm. 8080)_
     pub port: u16,
-    /// Time of last answer from node
-    pub last_seen: f64,
+    /// Time of last answer from node, monotonic so clock jumps don't make it stale
+    pub last_seen: Instant,
     /// Counter of bad requests to the node _(work like TTL in ipv4)_
     pub failed_pings: u32,
 }
@@ -52,13 +85,11 @@ impl Node {
     ///
     /// Last seen of node is now after node create
     pub fn new(node_id: NodeID, address: String, port: u16) -> Self {
-        let now = get_now_f64();
-
         Self {
             node_id,
             address,
             port,
-            last_seen: now,
+            last_seen: Instant::now(),
             failed_pings: 0,
         }
     }
@@ -67,7 +98,7 @@ impl Node {
     ///
     /// Call if we have some pings from node
     pub fn update_seen(&mut self) {
-        self.last_seen = get_now_f64();
+        self.last_seen = Instant::now();
         self.failed_pings = 0;
     }
 
@@ -82,8 +113,7 @@ impl Node {
     ///
     /// Function compare current time with time of last seen of the node
     pub fn is_stale(&self, timeout: f64) -> bool {
-        let now = get_now_f64();
-        (now - self.last_seen) > timeout
+        self.last_seen.elapsed().as_secs_f64() > timeout
     }
 }
 
@@ -1,14 +1,42 @@
 use async_trait::async_trait;
 use futures::future::join_all;
-use std::collections::{HashMap, HashSet};
+use futures::stream::{FuturesUnordered, StreamExt};
+use std::collections::{BTreeMap, HashMap, HashSet};
 use std::sync::Arc;
-use tokio::sync::RwLock;
+use std::time::Duration;
+use tokio::sync::{Mutex, RwLock, Semaphore};
 use tracing::debug;
 
-use crate::dht::node::{Node, NodeID};
+use crate::dht::node::{Distance, Node, NodeID};
 use crate::dht::routing_table::RoutingTable;
 use crate::exceptions::{DHTError, RhizomeError};
+use crate::logger::KeyHex;
 use crate::storage::main::Storage;
+use crate::utils::cache::TtlCache;
+use crate::utils::crypto::key_to_node_id;
+
+/// Max count of cached `find_node` results
+const CLOSEST_CACHE_SIZE: usize = 1024;
+/// How long cached closest nodes are trusted
+const CLOSEST_CACHE_TTL: Duration = Duration::from_secs(15);
+/// Max count of cached values found in the network
+const VALUE_CACHE_SIZE: usize = 4096;
+/// How long value found in the network is returned without lookup,
+/// never longer than the value itself lives
+const VALUE_CACHE_TTL: Duration = Duration::from_secs(60);
+/// TTL of a found value copied to the closest node that missed it,
+/// halved for every seen node which is closer to the key
+const PATH_CACHE_TTL: i32 = 3600;
+/// Copies with shorter TTL are not worth the STORE
+const PATH_CACHE_MIN_TTL: i32 = 60;
+/// Lookup shortlist: distance to target -> (node, already queried)
+///
+/// Distance is counted once per node, map keeps nodes ordered and
+/// XOR distance is unique for every node id
+type Shortlist = BTreeMap<Distance, (Node, bool)>;
+
+/// STORE RPCs in flight for all callers together
+const MAX_STORES_IN_FLIGHT: usize = 32;
 
 /// Interface of the Network protocol for avoid cycle refs
 ///
@@ -26,6 +54,21 @@ pub trait NetworkProtocolTrait: Send + Sync {
         key: &[u8],
         remote_node: &Node,
     ) -> Result<Option<Vec<u8>>, RhizomeError>;
+    /// FIND_VALUE which also returns neighbors of the key on miss
+    ///
+    /// Lookup gets both answers in one round-trip instead of FIND_VALUE + FIND_NODE.
+    /// Found value comes with its TTL left on the remote node, zero when it is unknown
+    async fn find_value_and_neighbors(
+        &self,
+        key: &[u8],
+        target_id: &NodeID,
+        remote_node: &Node,
+    ) -> Result<(Option<(Vec<u8>, Duration)>, Vec<Node>), RhizomeError> {
+        if let Ok(Some(val)) = self.find_value(key, remote_node).await {
+            return Ok((Some((val, Duration::ZERO)), Vec::new()));
+        }
+        Ok((None, self.find_node(target_id, remote_node).await?))
+    }
     async fn store(
         &self,
         key: &[u8],
@@ -45,6 +88,12 @@ pub struct DHTProtocol {
     pub network_protocol: Option<Arc<dyn NetworkProtocolTrait>>,
     /// Parallelism parameter _(usually 3)_
     pub alpha: usize,
+    /// Recent lookups: target -> (routing table version, closest nodes)
+    closest_cache: Mutex<TtlCache<NodeID, (u64, Vec<Node>)>>,
+    /// Recent values found on other nodes
+    value_cache: Mutex<TtlCache<Vec<u8>, Vec<u8>>>,
+    /// Permits for outgoing STORE RPCs, concurrent `store` calls share them
+    store_permits: Arc<Semaphore>,
 }
 
 impl DHTProtocol {
@@ -58,6 +107,9 @@ impl DHTProtocol {
             storage,
             network_protocol,
             alpha: 3,
+            closest_cache: Mutex::new(TtlCache::new(CLOSEST_CACHE_SIZE, CLOSEST_CACHE_TTL)),
+            value_cache: Mutex::new(TtlCache::new(VALUE_CACHE_SIZE, VALUE_CACHE_TTL)),
+            store_permits: Arc::new(Semaphore::new(MAX_STORES_IN_FLIGHT)),
         }
     }
 
@@ -84,11 +136,17 @@ impl DHTProtocol {
 
     /// Kademlia lookup
     ///
-    /// Algorithm finds the closest nodes for our node by using our alpha
+    /// Algorithm finds the closest nodes for our node by using our alpha.
+    /// Up to `alpha` requests are in flight, a new one starts as soon as any of them
+    /// answers, so a slow peer does not hold the other slots
     pub async fn find_node(&self, target_id: &NodeID) -> Result<Vec<Node>, RhizomeError> {
-        let mut closest = {
+        let (closest, version, k) = {
             let rt = self.routing_table.read().await;
-            rt.find_closest_nodes(target_id, self.alpha)
+            (
+                rt.find_closest_nodes(target_id, self.alpha),
+                rt.version,
+                rt.k.max(self.alpha),
+            )
         };
 
         let net = match &self.network_protocol {
@@ -96,54 +154,45 @@ impl DHTProtocol {
             None => return Ok(closest),
         };
 
-        let mut seen_nodes: HashMap<NodeID, Node> =
-            closest.iter().map(|n| (n.node_id, n.clone())).collect();
-        let mut queried: HashSet<NodeID> = HashSet::new();
-
-        loop {
-            let candidates: Vec<Node> = closest
-                .iter()
-                .filter(|n| !queried.contains(&n.node_id))
-                .take(self.alpha)
-                .cloned()
-                .collect();
-
-            if candidates.is_empty() {
-                break;
-            }
-
-            let mut tasks = Vec::new();
-            for node in &candidates {
-                tasks.push(net.find_node(target_id, node));
-            }
-
-            let results = join_all(tasks).await;
-            let mut new_nodes_found = false;
+        // Результат недавнего поиска годен, пока состав таблицы маршрутизации не менялся
+        if let Some((cached_version, nodes)) = self.closest_cache.lock().await.get(target_id)
+            && *cached_version == version
+        {
+            return Ok(nodes.clone());
+        }
 
-            for found_nodes in results.into_iter().flatten() {
-                for node in found_nodes {
-                    if let std::collections::hash_map::Entry::Vacant(e) =
-                        seen_nodes.entry(node.node_id)
-                    {
-                        e.insert(node.clone());
-                        new_nodes_found = true;
-                    }
-                }
-            }
+        let mut seen_nodes: Shortlist = closest
+            .into_iter()
+            .map(|n| (n.node_id.distance_key(target_id), (n, false)))
+            .collect();
+        let mut in_flight = FuturesUnordered::new();
 
-            for node in candidates {
-                queried.insert(node.node_id);
+        loop {
+            while in_flight.len() < self.alpha {
+                let Some(node) = self.next_candidate(&mut seen_nodes) else {
+                    break;
+                };
+                in_flight.push(async move { net.find_node(target_id, &node).await });
             }
 
-            let mut all_found: Vec<Node> = seen_nodes.values().cloned().collect();
-            all_found.sort_by_key(|n| n.node_id.distance_to(target_id));
-            closest = all_found.into_iter().take(self.alpha).collect();
-
-            if !new_nodes_found {
+            // Ни одного запроса в полете и нет новых кандидатов: поиск сошелся
+            let Some(result) = in_flight.next().await else {
                 break;
-            }
+            };
+
+            Self::merge_nodes(&mut seen_nodes, result.unwrap_or_default(), target_id, k);
         }
 
+        let closest: Vec<Node> = seen_nodes
+            .into_values()
+            .take(self.alpha)
+            .map(|(node, _)| node)
+            .collect();
+        self.closest_cache
+            .lock()
+            .await
+            .insert(*target_id, (version, closest.clone()));
+
         Ok(closest)
     }
 
@@ -152,8 +201,8 @@ impl DHTProtocol {
     /// Firstly we should check in our local storage:
     /// - If we have the value we will return them
     ///  
-    /// If we do not have data we start iterative find.
-    /// If some node send signal we choose the data and return them.
+    /// If we do not have data we start iterative find with the same sliding
+    /// window as `find_node`. If some node send signal we choose the data and return them.
     pub async fn find_value(&self, key: &[u8]) -> Result<Vec<u8>, RhizomeError> {
         if let Some(val) = self.storage.get(key.to_vec()).await? {
             return Ok(val);
@@ -164,70 +213,156 @@ impl DHTProtocol {
             .as_ref()
             .ok_or(RhizomeError::Dht(DHTError::ValueNotFound))?;
 
-        let mut id_bytes = [0u8; 20];
-        let len = key.len().min(20);
-        id_bytes[..len].copy_from_slice(&key[..len]);
-        let target_id = NodeID::new(id_bytes);
+        if let Some(val) = self.value_cache.lock().await.get(&key.to_vec()) {
+            return Ok(val.clone());
+        }
+
+        let target_id = NodeID::new(key_to_node_id(key));
 
-        let mut closest = {
+        let (closest, version, k) = {
             let rt = self.routing_table.read().await;
-            rt.find_closest_nodes(&target_id, self.alpha)
+            (
+                rt.find_closest_nodes(&target_id, self.alpha),
+                rt.version,
+                rt.k.max(self.alpha),
+            )
         };
 
-        let mut seen_nodes: HashMap<NodeID, Node> =
-            closest.iter().map(|n| (n.node_id, n.clone())).collect();
-        let mut queried: HashSet<NodeID> = HashSet::new();
+        let mut seen_nodes: Shortlist = closest
+            .into_iter()
+            .map(|n| (n.node_id.distance_key(&target_id), (n, false)))
+            .collect();
+        let mut in_flight = FuturesUnordered::new();
+        // The closest node which answered with neighbors instead of the value
+        let mut closest_miss: Option<(Distance, Node)> = None;
 
         loop {
-            let candidates: Vec<Node> = closest
-                .iter()
-                .filter(|n| !queried.contains(&n.node_id))
-                .take(self.alpha)
-                .cloned()
-                .collect();
-
-            if candidates.is_empty() {
-                break;
+            while in_flight.len() < self.alpha {
+                let Some(node) = self.next_candidate(&mut seen_nodes) else {
+                    break;
+                };
+                let target_id = &target_id;
+                in_flight.push(async move {
+                    let result = net.find_value_and_neighbors(key, target_id, &node).await;
+                    (node, result)
+                });
             }
 
-            let mut value_tasks = Vec::new();
-            for node in &candidates {
-                value_tasks.push(net.find_value(key, node));
-            }
-            let results = join_all(value_tasks).await;
-
-            for result in results {
-                if let Ok(Some(val)) = result {
+            let Some((node, result)) = in_flight.next().await else {
+                break;
+            };
+
+            match result {
+                Ok((Some((val, ttl_left)), _)) => {
+                    let cache_ttl = ttl_left.min(VALUE_CACHE_TTL);
+                    if !cache_ttl.is_zero() {
+                        self.value_cache.lock().await.insert_with_ttl(
+                            key.to_vec(),
+                            val.clone(),
+                            cache_ttl,
+                        );
+                    }
+                    if let Some((distance, miss)) = closest_miss {
+                        self.cache_on_path(key, &val, ttl_left, &seen_nodes, distance, miss);
+                    }
                     return Ok(val);
                 }
+                Ok((None, nodes)) => {
+                    let distance = node.node_id.distance_key(&target_id);
+                    if closest_miss
+                        .as_ref()
+                        .is_none_or(|(best, _)| distance < *best)
+                    {
+                        closest_miss = Some((distance, node));
+                    }
+                    Self::merge_nodes(&mut seen_nodes, nodes, &target_id, k);
+                }
+                Err(_) => {}
             }
+        }
 
-            let mut node_tasks = Vec::new();
-            for node in &candidates {
-                node_tasks.push(net.find_node(&target_id, node));
-            }
-            let node_results = join_all(node_tasks).await;
+        // Поиск сошелся без значения: его ближайшие узлы те же, что нашел бы find_node,
+        // следующий STORE по этому ключу обойдется без повторного обхода
+        let closest: Vec<Node> = seen_nodes
+            .into_values()
+            .take(self.alpha)
+            .map(|(node, _)| node)
+            .collect();
+        self.closest_cache
+            .lock()
+            .await
+            .insert(target_id, (version, closest));
 
-            for nodes in node_results.into_iter().flatten() {
-                for n in nodes {
-                    seen_nodes.entry(n.node_id).or_insert(n);
-                }
-            }
+        Err(RhizomeError::Dht(DHTError::ValueNotFound))
+    }
 
-            for node in candidates {
-                queried.insert(node.node_id);
-            }
+    /// Copy found value to the closest node on the lookup path which missed it
+    ///
+    /// Kademlia caching: next lookups of a hot key stop earlier. TTL gets exponentially
+    /// shorter with every seen node closer to the key and never outlives the found value.
+    /// STORE runs in background,
+    /// so the hit path does not wait for it. It is only an optimization, so it is
+    /// skipped when all STORE permits are taken
+    fn cache_on_path(
+        &self,
+        key: &[u8],
+        value: &[u8],
+        ttl_left: Duration,
+        seen_nodes: &Shortlist,
+        distance: Distance,
+        node: Node,
+    ) {
+        let closer = seen_nodes.range(..distance).count().min(31) as u32;
+        let ttl_left = ttl_left.as_secs().min(i32::MAX as u64) as i32;
+        let ttl = (PATH_CACHE_TTL >> closer).min(ttl_left);
+        if ttl < PATH_CACHE_MIN_TTL {
+            return;
+        }
 
-            let mut all_found: Vec<Node> = seen_nodes.values().cloned().collect();
-            all_found.sort_by_key(|n| n.node_id.distance_to(&target_id));
-            closest = all_found.into_iter().take(self.alpha).collect();
+        let Some(net) = self.network_protocol.clone() else {
+            return;
+        };
+        let Ok(permit) = self.store_permits.clone().try_acquire_owned() else {
+            return;
+        };
 
-            if queried.len() >= seen_nodes.len() {
-                break;
+        let key = key.to_vec();
+        let value = value.to_vec();
+        tokio::spawn(async move {
+            let _ = net.store(&key, &value, ttl, &node).await;
+            drop(permit);
+        });
+    }
+
+    /// Merge answered nodes into the lookup shortlist of `limit` closest nodes
+    ///
+    /// Seen nodes only get closer, so a node which fell out of the shortlist can never
+    /// come back to the `alpha` candidates and is dropped instead of growing the map
+    fn merge_nodes(seen_nodes: &mut Shortlist, nodes: Vec<Node>, target_id: &NodeID, limit: usize) {
+        for node in nodes {
+            let distance = node.node_id.distance_key(target_id);
+            if seen_nodes.len() >= limit
+                && seen_nodes
+                    .last_key_value()
+                    .is_some_and(|(farthest, _)| distance >= *farthest)
+            {
+                continue;
             }
+            seen_nodes.entry(distance).or_insert((node, false));
         }
+        while seen_nodes.len() > limit {
+            seen_nodes.pop_last();
+        }
+    }
 
-        Err(RhizomeError::Dht(DHTError::ValueNotFound))
+    /// The closest not queried node among `alpha` closest seen nodes, marked as queried
+    fn next_candidate(&self, seen_nodes: &mut Shortlist) -> Option<Node> {
+        let (node, queried) = seen_nodes
+            .values_mut()
+            .take(self.alpha)
+            .find(|(_, queried)| !*queried)?;
+        *queried = true;
+        Some(node.clone())
     }
 
     /// Store data
@@ -236,16 +371,14 @@ impl DHTProtocol {
     /// Secondly send data for our closest nodes
     pub async fn store(&self, key: &[u8], value: &[u8], ttl: i32) -> Result<bool, RhizomeError> {
         self.storage.put(key.to_vec(), value.to_vec(), ttl).await?;
+        self.value_cache.lock().await.remove(&key.to_vec());
 
         let net = match &self.network_protocol {
             Some(n) => n,
             None => return Ok(true),
         };
 
-        let mut id_bytes = [0u8; 20];
-        let len = key.len().min(20);
-        id_bytes[..len].copy_from_slice(&key[..len]);
-        let target_id = NodeID::new(id_bytes);
+        let target_id = NodeID::new(key_to_node_id(key));
 
         let closest_nodes = self.find_node(&target_id).await?;
 
@@ -257,7 +390,7 @@ impl DHTProtocol {
         let mut store_tasks = Vec::new();
 
         for node in closest_nodes.iter().take(k) {
-            store_tasks.push(net.store(key, value, ttl, node));
+            store_tasks.push(self.bounded_store(net, key, value, ttl, node));
         }
 
         let results = join_all(store_tasks).await;
@@ -267,7 +400,7 @@ impl DHTProtocol {
             .count();
 
         debug!(
-            key = %hex::encode(&key[..key.len().min(8)]),
+            key = %KeyHex(key),
             success = success_count,
             attempted = k,
             "STORE completed"
@@ -275,4 +408,102 @@ impl DHTProtocol {
 
         Ok(success_count > 0)
     }
+
+    /// Send one STORE RPC after taking a permit
+    ///
+    /// Several `store` calls at once do not multiply sockets and tasks in flight
+    async fn bounded_store(
+        &self,
+        net: &Arc<dyn NetworkProtocolTrait>,
+        key: &[u8],
+        value: &[u8],
+        ttl: i32,
+        node: &Node,
+    ) -> Result<bool, RhizomeError> {
+        let _permit = self.store_permits.acquire().await;
+        net.store(key, value, ttl, node).await
+    }
+
+    /// Store a batch of values
+    ///
+    /// All items are saved locally, then lookups for unique targets run concurrently
+    /// and all STORE RPCs are sent in one batch. Returns success flag for every item
+    pub async fn store_many(
+        &self,
+        items: &[(Vec<u8>, Vec<u8>, i32)],
+    ) -> Result<Vec<bool>, RhizomeError> {
+        for (key, value, ttl) in items {
+            self.storage.put(key.clone(), value.clone(), *ttl).await?;
+        }
+        {
+            let mut value_cache = self.value_cache.lock().await;
+            for (key, _, _) in items {
+                value_cache.remove(key);
+            }
+        }
+
+        let net = match &self.network_protocol {
+            Some(n) => n,
+            None => return Ok(vec![true; items.len()]),
+        };
+
+        let target_ids: Vec<NodeID> = items
+            .iter()
+            .map(|(key, _, _)| NodeID::new(key_to_node_id(key)))
+            .collect();
+
+        let mut unique_targets: Vec<NodeID> = Vec::with_capacity(target_ids.len());
+        let mut seen_targets: HashSet<NodeID> = HashSet::with_capacity(target_ids.len());
+        for target_id in &target_ids {
+            if seen_targets.insert(*target_id) {
+                unique_targets.push(*target_id);
+            }
+        }
+
+        let lookups = join_all(unique_targets.iter().map(|t| self.find_node(t))).await;
+        let mut closest_by_target: HashMap<NodeID, Vec<Node>> =
+            HashMap::with_capacity(unique_targets.len());
+        for (target_id, lookup) in unique_targets.into_iter().zip(lookups) {
+            closest_by_target.insert(target_id, lookup?);
+        }
+
+        let k = { self.routing_table.read().await.k };
+        let mut store_tasks = Vec::new();
+        let mut task_owner = Vec::new();
+
+        for (idx, ((key, value, ttl), target_id)) in items.iter().zip(&target_ids).enumerate() {
+            if let Some(nodes) = closest_by_target.get(target_id) {
+                for node in nodes.iter().take(k) {
+                    store_tasks.push(self.bounded_store(net, key, value, *ttl, node));
+                    task_owner.push(idx);
+                }
+            }
+        }
+
+        let mut success_counts = vec![0usize; items.len()];
+        let results = join_all(store_tasks).await;
+        for (idx, result) in task_owner.into_iter().zip(results) {
+            if matches!(result, Ok(true)) {
+                success_counts[idx] += 1;
+            }
+        }
+
+        debug!(
+            items = items.len(),
+            targets = closest_by_target.len(),
+            "Batch STORE completed"
+        );
+
+        Ok(items
+            .iter()
+            .zip(&target_ids)
+            .zip(success_counts)
+            .map(|((_, target_id), count)| {
+                closest_by_target
+                    .get(target_id)
+                    .is_none_or(|nodes| nodes.is_empty())
+                    || count > 0
+            })
+            .collect())
+    }
 }
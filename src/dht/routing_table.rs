@@ -1,6 +1,7 @@
+use std::time::Instant;
+
 use crate::config::d_bucket_timeout;
-use crate::dht::node::{Node, NodeID};
-use crate::utils::time::get_now_f64;
+use crate::dht::node::{Distance, Node, NodeID};
 
 /// K-Buckets for saving nodes with their distance
 pub struct KBucket {
@@ -9,30 +10,46 @@ pub struct KBucket {
     /// List of nodes in this bucket
     pub nodes: Vec<Node>,
     /// Time of last update
-    pub last_updated: f64,
+    pub last_updated: Instant,
 }
 
 impl KBucket {
+    /// Create empty bucket
+    ///
+    /// Node list is allocated on the first insert, most of 160 buckets stay empty
     pub fn new(k: usize) -> Self {
         Self {
             k,
-            nodes: Vec::with_capacity(k),
-            last_updated: get_now_f64(),
+            nodes: Vec::new(),
+            last_updated: Instant::now(),
         }
     }
 
+    /// Index of the node in the bucket
+    pub fn position(&self, node_id: &NodeID) -> Option<usize> {
+        self.nodes.iter().position(|n| &n.node_id == node_id)
+    }
+
     /// Node add with LRU logic
+    ///
+    /// Known node is moved to the tail by one rotation of the tail part,
+    /// without shifting the list twice and touching allocator
     pub fn add_node(&mut self, node: Node) -> bool {
-        if let Some(index) = self.nodes.iter().position(|n| n.node_id == node.node_id) {
-            self.nodes.remove(index);
-            self.nodes.push(node);
-            self.last_updated = get_now_f64();
+        if let Some(index) = self.position(&node.node_id) {
+            self.nodes[index..].rotate_left(1);
+            if let Some(last) = self.nodes.last_mut() {
+                *last = node;
+            }
+            self.last_updated = Instant::now();
             return true;
         }
 
         if self.nodes.len() < self.k {
+            if self.nodes.capacity() == 0 {
+                self.nodes.reserve_exact(self.k);
+            }
             self.nodes.push(node);
-            self.last_updated = get_now_f64();
+            self.last_updated = Instant::now();
             return true;
         }
 
@@ -41,9 +58,9 @@ impl KBucket {
 
     /// Remove node from bucket
     pub fn remove_node(&mut self, node_id: &NodeID) {
-        if let Some(index) = self.nodes.iter().position(|n| &n.node_id == node_id) {
+        if let Some(index) = self.position(node_id) {
             self.nodes.remove(index);
-            self.last_updated = get_now_f64();
+            self.last_updated = Instant::now();
         }
     }
 
@@ -66,6 +83,8 @@ pub struct RoutingTable {
     pub k: usize,
     /// 160-counted buckets for 160-bits NodeId
     pub buckets: Vec<KBucket>,
+    /// Counter of membership changes, cached lookups are valid only for the same value
+    pub version: u64,
 }
 
 impl RoutingTable {
@@ -79,22 +98,19 @@ impl RoutingTable {
             node_id,
             k,
             buckets,
+            version: 0,
         }
     }
 
     /// Find bucket index for node id by XOR distance algo
+    ///
+    /// Index is the count of leading zero bits of the distance, 160 bits are read
+    /// as `u128` and `u32` words. Low word counts only when high one is zero,
+    /// it is selected by multiplication, so there is no branch on the id data
     fn get_bucket_index(&self, target_id: &NodeID) -> usize {
-        let distance = self.node_id.distance_to(target_id);
-
-        for (i, &byte) in distance.iter().enumerate() {
-            if byte != 0 {
-                let leading_zeros = byte.leading_zeros() as usize;
-                let index = i * 8 + leading_zeros;
-                return index.min(self.buckets.len() - 1);
-            }
-        }
-
-        self.buckets.len() - 1
+        let (high, low) = self.node_id.distance_key(target_id);
+        let index = high.leading_zeros() + low.leading_zeros() * u32::from(high == 0);
+        (index as usize).min(self.buckets.len() - 1)
     }
 
     /// Add node in routing table
@@ -104,6 +120,7 @@ impl RoutingTable {
         }
 
         let bucket_index = self.get_bucket_index(&node.node_id);
+        let known = self.buckets[bucket_index].position(&node.node_id).is_some();
 
         if self.buckets[bucket_index].is_full() {
             let stale_index = self.buckets[bucket_index]
@@ -113,49 +130,113 @@ impl RoutingTable {
 
             if let Some(idx) = stale_index {
                 self.buckets[bucket_index].nodes.remove(idx);
+                self.version += 1;
                 return self.buckets[bucket_index].add_node(node);
             }
             return false;
         }
 
-        self.buckets[bucket_index].add_node(node)
+        let added = self.buckets[bucket_index].add_node(node);
+        if added && !known {
+            self.version += 1;
+        }
+        added
     }
 
     /// Remove node
     pub fn remove_node(&mut self, node_id: &NodeID) {
         let bucket_index = self.get_bucket_index(node_id);
-        self.buckets[bucket_index].remove_node(node_id);
+        let bucket = &mut self.buckets[bucket_index];
+        let before = bucket.nodes.len();
+        bucket.remove_node(node_id);
+        if bucket.nodes.len() != before {
+            self.version += 1;
+        }
+    }
+
+    /// Bucket indexes ordered from the closest to `target_id` to the farthest
+    ///
+    /// Node from bucket `j` has the same first `j` bits of distance to target as our
+    /// node and the flipped bit `j`. So buckets where our distance to target has bit `j`
+    /// set hold closer nodes (the smaller `j`, the closer), the others hold farther
+    /// nodes (the bigger `j`, the closer). The last bucket also keeps all deeper ids
+    /// and lies between these two groups
+    fn closest_bucket_order(&self, target_id: &NodeID) -> Vec<usize> {
+        let (high, low) = self.node_id.distance_key(target_id);
+        let last = self.buckets.len() - 1;
+        let depth = last.min(160);
+        let bit_set = |j: usize| {
+            if j < 128 {
+                high >> (127 - j) & 1 != 0
+            } else {
+                low >> (159 - j) & 1 != 0
+            }
+        };
+
+        let mut order = Vec::with_capacity(self.buckets.len());
+        order.extend((0..depth).filter(|&j| bit_set(j)));
+        order.push(last);
+        order.extend((0..depth).rev().filter(|&j| !bit_set(j)));
+        order
     }
 
     /// Find closest nodes
     pub fn find_closest_nodes(&self, target_id: &NodeID, count: usize) -> Vec<Node> {
-        let bucket_index = self.get_bucket_index(target_id);
-        let mut closest_nodes: Vec<Node> = Vec::new();
+        self.find_closest_refs(target_id, count)
+            .into_iter()
+            .cloned()
+            .collect()
+    }
 
-        for offset in 0..self.buckets.len() {
-            let idx = (bucket_index + offset) % self.buckets.len();
-            let nodes = self.buckets[idx].get_nodes();
-            closest_nodes.extend(nodes);
+    /// Find closest nodes without copying them
+    ///
+    /// Buckets are visited from the closest one, every next bucket is farther than
+    /// all nodes already taken, so only one bucket at a time is sorted and the walk
+    /// stops as soon as `count` nodes are found. It is the exact lower bound check:
+    /// no node of the next bucket can beat the nodes already taken
+    pub fn find_closest_refs(&self, target_id: &NodeID, count: usize) -> Vec<&Node> {
+        let mut closest_nodes: Vec<&Node> = Vec::with_capacity(count);
+        if self.buckets.is_empty() || count == 0 {
+            return closest_nodes;
+        }
 
-            if closest_nodes.len() >= count * 2 {
-                break;
+        for idx in self.closest_bucket_order(target_id) {
+            let bucket = &self.buckets[idx].nodes;
+            if bucket.is_empty() {
+                continue;
             }
-        }
 
-        closest_nodes.sort_by_key(|n| n.node_id.distance_to(target_id));
+            let mut by_distance: Vec<(Distance, &Node)> = bucket
+                .iter()
+                .map(|n| (n.node_id.distance_key(target_id), n))
+                .collect();
+
+            // Из последнего нужного бакета берем только часть: выбираем ее за O(n)
+            // и сортируем только выбранное
+            let take = (count - closest_nodes.len()).min(by_distance.len());
+            if take < by_distance.len() {
+                by_distance.select_nth_unstable_by_key(take, |(distance, _)| *distance);
+                by_distance.truncate(take);
+            }
+            by_distance.sort_unstable_by_key(|(distance, _)| *distance);
+
+            closest_nodes.extend(by_distance.into_iter().map(|(_, n)| n));
 
-        if closest_nodes.len() > count {
-            closest_nodes.truncate(count);
+            if closest_nodes.len() >= count {
+                break;
+            }
         }
 
         closest_nodes
     }
 
+    /// Iterate over all table nodes without copying them
+    pub fn iter_all_nodes(&self) -> impl Iterator<Item = &Node> {
+        self.buckets.iter().flat_map(|bucket| bucket.nodes.iter())
+    }
+
     /// Getting all table nodes
     pub fn get_all_nodes(&self) -> Vec<Node> {
-        self.buckets
-            .iter()
-            .flat_map(|bucket| bucket.nodes.clone())
-            .collect()
+        self.iter_all_nodes().cloned().collect()
     }
 }
@@ -76,3 +76,17 @@ pub fn setup_logging(log_level: &str, log_file: Option<PathBuf>, node_id: Option
 pub fn get_logger(name: &'static str) {
     tracing::info!(module = name, "Module logger initialized");
 }
+
+/// Short hex form of a key for log fields _(first 8 bytes)_
+///
+/// Unlike eager `hex::encode` it is formatted only if the event passes the level filter
+pub struct KeyHex<'a>(pub &'a [u8]);
+
+impl std::fmt::Display for KeyHex<'_> {
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
+        for byte in &self.0[..self.0.len().min(8)] {
+            write!(f, "{byte:02x}")?;
+        }
+        Ok(())
+    }
+}
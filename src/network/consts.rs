@@ -37,3 +37,8 @@ pub const MSG_GLOBAL_RANKING_REQUEST: u8 = 0x0B;
 
 /// Answer with global ranking
 pub const MSG_GLOBAL_RANKING_RESPONSE: u8 = 0x0C;
+
+/// Answers have even types, requests have odd ones
+pub const fn is_response(msg_type: u8) -> bool {
+    msg_type.is_multiple_of(2)
+}
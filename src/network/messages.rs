@@ -0,0 +1,117 @@
+//! Typed payloads of protocol messages
+//!
+//! Every `MSG_*` type has its own struct, so handlers read checked fields
+//! instead of looking up keys in a generic map. `MSG_PING` and `MSG_PONG` have
+//! no payload, sender id in the header is all they carry
+
+use serde::{Deserialize, Serialize};
+
+use crate::dht::node::{Node, NodeID};
+use crate::popularity::metrics::PopularityMetrics;
+use crate::popularity::ranking::RankedItem;
+use crate::utils::serialization::bin;
+
+/// `MSG_FIND_NODE`: request for the closest nodes to the target
+#[derive(Serialize, Deserialize, Debug)]
+pub struct FindNode {
+    #[serde(with = "bin")]
+    pub target_id: [u8; 20],
+}
+
+/// Contact of the node in responses
+#[derive(Serialize, Deserialize, Debug)]
+pub struct NodeInfo {
+    #[serde(with = "bin")]
+    pub node_id: [u8; 20],
+    pub address: String,
+    pub port: u16,
+}
+
+impl From<&Node> for NodeInfo {
+    fn from(node: &Node) -> Self {
+        Self {
+            node_id: node.node_id.0,
+            address: node.address.clone(),
+            port: node.port,
+        }
+    }
+}
+
+impl From<NodeInfo> for Node {
+    fn from(info: NodeInfo) -> Self {
+        Node::new(NodeID::new(info.node_id), info.address, info.port)
+    }
+}
+
+/// `MSG_FIND_NODE_RESPONSE`: the closest known nodes
+#[derive(Serialize, Deserialize, Debug)]
+pub struct Nodes {
+    pub nodes: Vec<NodeInfo>,
+}
+
+/// `MSG_FIND_VALUE`: request for the value by key
+#[derive(Serialize, Deserialize, Debug)]
+pub struct FindValue {
+    #[serde(with = "bin")]
+    pub key: Vec<u8>,
+}
+
+/// `MSG_FIND_VALUE_RESPONSE`: the value or nodes which are closer to it
+#[derive(Serialize, Deserialize, Debug)]
+pub enum FindValueResult {
+    /// Value and whole seconds left of its TTL on the answering node
+    Found(#[serde(with = "bin")] Vec<u8>, u32),
+    Nodes(Vec<NodeInfo>),
+}
+
+/// `MSG_STORE`: request to save pair key-value
+#[derive(Serialize, Deserialize, Debug)]
+pub struct Store {
+    #[serde(with = "bin")]
+    pub key: Vec<u8>,
+    #[serde(with = "bin")]
+    pub value: Vec<u8>,
+    pub ttl: i32,
+}
+
+/// `MSG_STORE_RESPONSE`
+#[derive(Serialize, Deserialize, Debug)]
+pub struct StoreResult {
+    pub success: bool,
+}
+
+/// Ranked item of the popularity exchange
+#[derive(Serialize, Deserialize, Debug)]
+pub struct PopularityItem {
+    /// Raw content key, msgpack bin is half the size of hex
+    #[serde(with = "bin")]
+    pub key: Vec<u8>,
+    pub score: f64,
+    pub metrics: PopularityMetrics,
+}
+
+impl From<&RankedItem> for PopularityItem {
+    fn from(item: &RankedItem) -> Self {
+        Self {
+            key: item.key.clone(),
+            score: item.score,
+            metrics: item.metrics.clone(),
+        }
+    }
+}
+
+/// `MSG_POPULARITY_EXCHANGE` and its response: ranked items of the sender
+#[derive(Serialize, Deserialize, Debug)]
+pub struct PopularityItems {
+    pub items: Vec<PopularityItem>,
+}
+
+/// `MSG_GLOBAL_RANKING_REQUEST`
+#[derive(Serialize, Deserialize, Debug)]
+pub struct GlobalRankingRequest {}
+
+/// `MSG_GLOBAL_RANKING_RESPONSE`
+#[derive(Serialize, Deserialize, Debug)]
+pub struct GlobalRanking {
+    pub ranking: Vec<PopularityItem>,
+}
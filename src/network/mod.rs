@@ -2,6 +2,8 @@
 ///
 /// Need for serialization in network.
 pub mod consts;
+/// Typed payloads of protocol messages
+pub mod messages;
 /// Network protocol
 ///
 /// Module for sending data and receive data from internet.
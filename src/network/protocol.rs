@@ -1,7 +1,6 @@
 use async_trait::async_trait;
 use rand::Rng;
 use serde::{Deserialize, Serialize};
-use std::collections::HashMap;
 use std::net::SocketAddr;
 use std::sync::Arc;
 use std::time::Duration;
@@ -14,29 +13,76 @@ use crate::dht::protocol::NetworkProtocolTrait;
 use crate::dht::routing_table::RoutingTable;
 use crate::exceptions::{NetworkError, RhizomeError};
 use crate::network::consts::*;
+use crate::network::messages::{
+    FindNode, FindValue, FindValueResult, GlobalRanking, GlobalRankingRequest, NodeInfo, Nodes,
+    PopularityItem, PopularityItems, Store, StoreResult,
+};
 use crate::network::transport::{Message, UDPTransport};
 use crate::popularity::exchanger::PopularityExchanger;
 use crate::security::rate_limiter::RateLimiter;
 use crate::storage::main::Storage;
-use crate::utils::time::get_now_f64;
+use crate::utils::cache::TtlCache;
+use crate::utils::crypto::key_to_node_id;
+use crate::utils::serialization::{from_msgpack, to_msgpack_into};
+
+/// Size of the fixed message header: type, message id and sender id
+pub const HEADER_LEN: usize = 1 + 16 + 20;
 
 /// Message structure
-#[derive(Serialize, Deserialize, Debug)]
-pub struct ProtocolMessage {
-    #[serde(rename = "type")]
+///
+/// Datagram is `type (1) | id (16) | node_id (20) | msgpack payload`. UDP already
+/// frames messages, so the header is read by offsets without any decoding
+#[derive(Debug)]
+pub struct ProtocolMessage<'a> {
     /// Type of message _(PING, STORE)_
     pub msg_type: u8,
     /// Uniq id for transfer _(nonce)_
     pub id: [u8; 16],
     /// Source ID
     pub node_id: [u8; 20],
-    /// Transferred data in JSON binary format
-    pub payload: serde_json::Value,
-    /// Time of sending
-    pub timestamp: f64,
+    /// Typed payload of the message type, encoded as msgpack
+    pub payload: &'a [u8],
+}
+
+impl<'a> ProtocolMessage<'a> {
+    /// Read the header, payload stays borrowed from the datagram
+    pub fn parse(data: &'a [u8]) -> Option<Self> {
+        let (&msg_type, rest) = data.split_first()?;
+        let (id, rest) = rest.split_first_chunk::<16>()?;
+        let (node_id, payload) = rest.split_first_chunk::<20>()?;
+        Some(Self {
+            msg_type,
+            id: *id,
+            node_id: *node_id,
+            payload,
+        })
+    }
+}
+
+/// Answer handed to the waiting request
+///
+/// Keeps the whole received datagram, so the payload is not copied out of it
+#[derive(Debug)]
+pub struct Response {
+    pub msg_type: u8,
+    datagram: Box<[u8]>,
+}
+
+impl Response {
+    /// Msgpack payload after the header
+    pub fn payload(&self) -> &[u8] {
+        &self.datagram[HEADER_LEN..]
+    }
 }
 
-type ResponseSender = oneshot::Sender<(u8, serde_json::Value)>;
+type ResponseSender = oneshot::Sender<Response>;
+
+/// Requests waiting for an answer at once
+///
+/// Waiter of the evicted request gets closed channel and fails at once
+const MAX_PENDING_REQUESTS: usize = 4096;
+/// Default time to wait for an answer
+const REQUEST_TIMEOUT: Duration = Duration::from_secs(10);
 
 /// Network protocol for sending data by UDP
 pub struct NetworkProtocol {
@@ -55,7 +101,9 @@ pub struct NetworkProtocol {
     /// Protection of DDOS and spam
     pub rate_limiter: Arc<Mutex<RateLimiter>>,
     /// List of items which we are wait
-    pub pending_requests: Arc<Mutex<HashMap<[u8; 16], ResponseSender>>>,
+    ///
+    /// Bounded, and entries of dropped lookups expire instead of staying forever
+    pub pending_requests: Arc<Mutex<TtlCache<[u8; 16], ResponseSender>>>,
     /// How much time we need to wait the answer
     pub request_timeout: Duration,
 }
@@ -76,8 +124,11 @@ impl NetworkProtocol {
             storage,
             popularity_exchanger: Arc::new(RwLock::new(None)),
             rate_limiter: Arc::new(Mutex::new(RateLimiter::new(100, 60, 20))),
-            pending_requests: Arc::new(Mutex::new(HashMap::new())),
-            request_timeout: Duration::from_secs(10),
+            pending_requests: Arc::new(Mutex::new(TtlCache::new(
+                MAX_PENDING_REQUESTS,
+                REQUEST_TIMEOUT,
+            ))),
+            request_timeout: REQUEST_TIMEOUT,
         }
     }
 
@@ -108,31 +159,36 @@ impl NetworkProtocol {
 
     /// Validation of incoming messages
     ///
-    /// Deserialize data and check rate limit
+    /// Parse header and check rate limit, payload is decoded only by its handler.
+    /// Answers are matched by id from the header: late or unknown ones are dropped
+    /// before any decoding and don't count against the rate limit
     pub async fn handle_incoming_message(&self, message: Message) {
-        let raw_msg: Result<ProtocolMessage, _> = rmp_serde::from_slice(&message.data);
+        let Some(m) = ProtocolMessage::parse(&message.data) else {
+            return;
+        };
 
-        if let Ok(m) = raw_msg {
-            let mut limiter = self.rate_limiter.lock().await;
-            if limiter.check_rate_limit(Some(&m.node_id)).is_err() {
-                warn!(address = %message.address, "Rate limit exceeded");
-                return;
+        if is_response(m.msg_type) {
+            let sender = self.pending_requests.lock().await.remove(&m.id);
+            if let Some(sender) = sender
+                && !sender.is_closed()
+            {
+                let _ = sender.send(Response {
+                    msg_type: m.msg_type,
+                    datagram: message.data,
+                });
             }
-            drop(limiter);
+            return;
+        }
 
-            let mut pending = self.pending_requests.lock().await;
-            if let Some(sender) = pending.remove(&m.id) {
-                let _ = sender.send((m.msg_type, m.payload));
-                return;
-            }
-            drop(pending);
+        let mut limiter = self.rate_limiter.lock().await;
+        if limiter.check_rate_limit(Some(&m.node_id)).is_err() {
+            warn!(address = %message.address, "Rate limit exceeded");
+            return;
+        }
+        drop(limiter);
 
-            if let Err(e) = self
-                .handle_request(m.msg_type, m.id, m.payload, message.address)
-                .await
-            {
-                error!(error = %e, "Error handling request");
-            }
+        if let Err(e) = self.handle_request(&m, message.address).await {
+            error!(error = %e, "Error handling request");
         }
     }
 
@@ -144,184 +200,189 @@ impl NetworkProtocol {
     ///   our neighbors which maybe know data
     /// - `MSG_STORE`: Chose data from message and save it in our store
     /// - `MSG_POPULARITY_EXCHANGE`: Exchange information about content popularity
+    ///
+    /// Every type has its own handler, match over `u8` compiles into a jump table
     pub async fn handle_request(
         &self,
-        msg_type: u8,
-        msg_id: [u8; 16],
-        payload: serde_json::Value,
+        message: &ProtocolMessage<'_>,
         address: SocketAddr,
     ) -> Result<(), RhizomeError> {
+        let (msg_type, msg_id, payload) = (message.msg_type, message.id, message.payload);
         match msg_type {
-            MSG_PING => {
-                if let Some(rt_link) = &self.routing_table
-                    && let Some(id_val) = payload.get("node_id").and_then(|v| v.as_array())
-                {
-                    let mut id_bytes = [0u8; 20];
-                    for (i, v) in id_val.iter().enumerate().take(20) {
-                        id_bytes[i] = v.as_u64().unwrap_or(0) as u8;
-                    }
-                    let sender_node = Node::new(
-                        NodeID::new(id_bytes),
-                        address.ip().to_string(),
-                        address.port(),
-                    );
-                    rt_link.write().await.add_node(sender_node);
-                }
-
-                let response_payload = serde_json::json!({
-                    "node_id": self.node_id.0,
-                    "address": self.local_address.to_string()
-                });
-                self.send_response(MSG_PONG, msg_id, response_payload, address)
-                    .await?;
+            MSG_PING => self.on_ping(msg_id, message.node_id, address).await,
+            MSG_FIND_NODE => self.on_find_node(msg_id, payload, address).await,
+            MSG_FIND_VALUE => self.on_find_value(msg_id, payload, address).await,
+            MSG_STORE => self.on_store(msg_id, payload, address).await,
+            MSG_POPULARITY_EXCHANGE => self.on_popularity_exchange(msg_id, payload, address).await,
+            MSG_GLOBAL_RANKING_REQUEST => self.on_global_ranking(msg_id, address).await,
+            _ => {
+                debug!("Unhandled message type: {}", msg_type);
+                Ok(())
             }
+        }
+    }
 
-            MSG_FIND_NODE => {
-                if let (Some(rt_link), Some(target_val)) =
-                    (&self.routing_table, payload.get("target_id"))
-                {
-                    let mut id_bytes = [0u8; 20];
-                    if let Some(arr) = target_val.as_array() {
-                        for (i, v) in arr.iter().enumerate().take(20) {
-                            id_bytes[i] = v.as_u64().unwrap_or(0) as u8;
-                        }
-                    }
+    /// PING: remember sender and answer with PONG
+    ///
+    /// Both messages are header only, so liveness probes never touch msgpack
+    async fn on_ping(
+        &self,
+        msg_id: [u8; 16],
+        sender_id: [u8; 20],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        if let Some(rt_link) = &self.routing_table {
+            let sender_node = Node::new(
+                NodeID::new(sender_id),
+                address.ip().to_string(),
+                address.port(),
+            );
+            rt_link.write().await.add_node(sender_node);
+        }
 
-                    let rt = rt_link.read().await;
-                    let closest = rt.find_closest_nodes(&NodeID::new(id_bytes), rt.k);
-
-                    let nodes_data: Vec<serde_json::Value> = closest
-                        .iter()
-                        .map(|n| {
-                            serde_json::json!({
-                                "node_id": n.node_id.0,
-                                "address": n.address,
-                                "port": n.port
-                            })
-                        })
-                        .collect();
-
-                    self.send_response(
-                        MSG_FIND_NODE_RESPONSE,
-                        msg_id,
-                        serde_json::json!({"nodes": nodes_data}),
-                        address,
-                    )
-                    .await?;
-                }
-            }
+        let data = self.pack_header(MSG_PONG, msg_id, 0);
+        self.transport.send(&data, address).await?;
+        Ok(())
+    }
 
-            MSG_FIND_VALUE => {
-                if let (Some(storage), Some(key_val)) = (&self.storage, payload.get("key")) {
-                    let key_bytes: Vec<u8> =
-                        serde_json::from_value(key_val.clone()).unwrap_or_default();
-                    let value = storage.get(key_bytes.clone()).await?;
-
-                    if let Some(v) = value {
-                        self.send_response(
-                            MSG_FIND_VALUE_RESPONSE,
-                            msg_id,
-                            serde_json::json!({"found": true, "value": v}),
-                            address,
-                        )
-                        .await?;
-                    } else if let Some(rt_link) = &self.routing_table {
-                        let mut id_bytes = [0u8; 20];
-                        let len = key_bytes.len().min(20);
-                        id_bytes[..len].copy_from_slice(&key_bytes[..len]);
-
-                        let rt = rt_link.read().await;
-                        let closest = rt.find_closest_nodes(&NodeID::new(id_bytes), rt.k);
-                        let nodes_data: Vec<serde_json::Value> = closest.iter().map(|n| {
-                            serde_json::json!({"node_id": n.node_id.0, "address": n.address, "port": n.port})
-                        }).collect();
-
-                        self.send_response(
-                            MSG_FIND_VALUE_RESPONSE,
-                            msg_id,
-                            serde_json::json!({"found": false, "nodes": nodes_data}),
-                            address,
-                        )
-                        .await?;
-                    }
-                }
-            }
+    /// FIND_NODE: answer with our closest nodes to the target
+    async fn on_find_node(
+        &self,
+        msg_id: [u8; 16],
+        payload: &[u8],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        let request: FindNode = decode_payload(payload)?;
+        let Some(rt_link) = &self.routing_table else {
+            return Ok(());
+        };
 
-            MSG_STORE => {
-                if let (Some(storage), Some(key_val), Some(val_val)) =
-                    (&self.storage, payload.get("key"), payload.get("value"))
-                {
-                    let key: Vec<u8> = serde_json::from_value(key_val.clone()).unwrap_or_default();
-                    let value: Vec<u8> =
-                        serde_json::from_value(val_val.clone()).unwrap_or_default();
-                    let ttl = payload.get("ttl").and_then(|v| v.as_i64()).unwrap_or(86400) as i32;
-
-                    storage.put(key, value, ttl).await?;
-                    self.send_response(
-                        MSG_STORE_RESPONSE,
-                        msg_id,
-                        serde_json::json!({"success": true}),
-                        address,
-                    )
-                    .await?;
-                }
+        let nodes = {
+            let rt = rt_link.read().await;
+            let closest = rt.find_closest_refs(&NodeID::new(request.target_id), rt.k);
+            Nodes {
+                nodes: closest.into_iter().map(NodeInfo::from).collect(),
             }
-            MSG_POPULARITY_EXCHANGE => {
-                let exchanger_lock = self.popularity_exchanger.read().await;
-                if let Some(exchanger) = exchanger_lock.as_ref() {
-                    if let Some(local_metrics) = exchanger.get_local_metrics().await {
-                        let ranked = exchanger.ranker.rank_items(&local_metrics, Some(100));
-                        let items: Vec<serde_json::Value> = ranked
-                            .iter()
-                            .map(|item| {
-                                serde_json::json!({
-                                    "key": hex::encode(&item.key),
-                                    "score": item.score,
-                                    "metrics": item.metrics.to_dict()
-                                })
-                            })
-                            .collect();
-
-                        self.send_response(
-                            MSG_POPULARITY_EXCHANGE_RESPONSE,
-                            msg_id,
-                            serde_json::json!({"items": items}),
-                            address,
-                        )
-                        .await?;
-                    }
+        };
+        self.send_response(MSG_FIND_NODE_RESPONSE, msg_id, &nodes, address)
+            .await
+    }
 
-                    if let Some(received_items) = payload.get("items").and_then(|v| v.as_array()) {
-                        exchanger
-                            .process_received_items(received_items.clone())
-                            .await;
-                    }
-                }
-            }
-            MSG_GLOBAL_RANKING_REQUEST => {
-                let exchanger_lock = self.popularity_exchanger.read().await;
-                if let Some(exchanger) = exchanger_lock.as_ref() {
-                    let ranking = exchanger.get_global_ranking_api().await;
-                    self.send_response(
-                        MSG_GLOBAL_RANKING_RESPONSE,
-                        msg_id,
-                        serde_json::json!({"ranking": ranking}),
-                        address,
-                    )
-                    .await?;
-                }
-            }
-            _ => debug!("Unhandled message type: {}", msg_type),
+    /// FIND_VALUE: answer with the value or with our closest nodes to the key
+    async fn on_find_value(
+        &self,
+        msg_id: [u8; 16],
+        payload: &[u8],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        let request: FindValue = decode_payload(payload)?;
+        let Some(storage) = &self.storage else {
+            return Ok(());
+        };
+
+        if let Some((value, ttl_left)) = storage.get_with_ttl(request.key.clone()).await? {
+            // Float to int cast saturates, value without expiration gets `u32::MAX`
+            return self
+                .send_response(
+                    MSG_FIND_VALUE_RESPONSE,
+                    msg_id,
+                    &FindValueResult::Found(value, ttl_left as u32),
+                    address,
+                )
+                .await;
+        }
+
+        if let Some(rt_link) = &self.routing_table {
+            let target_id = NodeID::new(key_to_node_id(&request.key));
+            let nodes = {
+                let rt = rt_link.read().await;
+                let closest = rt.find_closest_refs(&target_id, rt.k);
+                closest.into_iter().map(NodeInfo::from).collect()
+            };
+            self.send_response(
+                MSG_FIND_VALUE_RESPONSE,
+                msg_id,
+                &FindValueResult::Nodes(nodes),
+                address,
+            )
+            .await?;
+        }
+        Ok(())
+    }
+
+    /// STORE: save pair key-value in local storage
+    async fn on_store(
+        &self,
+        msg_id: [u8; 16],
+        payload: &[u8],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        let request: Store = decode_payload(payload)?;
+        let Some(storage) = &self.storage else {
+            return Ok(());
+        };
+
+        storage.put(request.key, request.value, request.ttl).await?;
+        self.send_response(
+            MSG_STORE_RESPONSE,
+            msg_id,
+            &StoreResult { success: true },
+            address,
+        )
+        .await
+    }
+
+    /// POPULARITY_EXCHANGE: answer with our top items and merge received ones
+    async fn on_popularity_exchange(
+        &self,
+        msg_id: [u8; 16],
+        payload: &[u8],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        let exchanger_lock = self.popularity_exchanger.read().await;
+        let Some(exchanger) = exchanger_lock.as_ref() else {
+            return Ok(());
+        };
+
+        if let Some(items) = exchanger.exchange_payload().await {
+            let mut data = self.pack_header(MSG_POPULARITY_EXCHANGE_RESPONSE, msg_id, items.len());
+            data.extend_from_slice(&items);
+            self.transport.send(&data, address).await?;
+        }
+
+        if let Ok(received) = decode_payload::<PopularityItems>(payload) {
+            exchanger.process_received_items(received.items).await;
         }
         Ok(())
     }
 
+    /// GLOBAL_RANKING_REQUEST: answer with cached global ranking
+    async fn on_global_ranking(
+        &self,
+        msg_id: [u8; 16],
+        address: SocketAddr,
+    ) -> Result<(), RhizomeError> {
+        let exchanger_lock = self.popularity_exchanger.read().await;
+        let Some(exchanger) = exchanger_lock.as_ref() else {
+            return Ok(());
+        };
+
+        let ranking = exchanger.get_global_ranking_items().await;
+        self.send_response(
+            MSG_GLOBAL_RANKING_RESPONSE,
+            msg_id,
+            &GlobalRanking { ranking },
+            address,
+        )
+        .await
+    }
+
     /// Send response to the node
-    pub async fn send_response(
+    pub async fn send_response<P: Serialize>(
         &self,
         msg_type: u8,
         msg_id: [u8; 16],
-        payload: serde_json::Value,
+        payload: &P,
         address: SocketAddr,
     ) -> Result<(), RhizomeError> {
         let data = self.pack_message(msg_type, msg_id, payload)?;
@@ -330,27 +391,64 @@ impl NetworkProtocol {
     }
 
     /// Serialize message
-    pub fn pack_message(
+    ///
+    /// Header is written by offsets and the payload is encoded right after it,
+    /// so the datagram is built in one buffer
+    pub fn pack_message<P: Serialize>(
         &self,
         msg_type: u8,
         msg_id: [u8; 16],
-        payload: serde_json::Value,
+        payload: &P,
     ) -> Result<Vec<u8>, RhizomeError> {
-        let msg = ProtocolMessage {
-            msg_type,
-            id: msg_id,
-            node_id: self.node_id.0,
-            payload,
-            timestamp: get_now_f64(),
-        };
-        rmp_serde::to_vec(&msg).map_err(|_| RhizomeError::Network(NetworkError::General))
+        let mut data = self.pack_header(msg_type, msg_id, 64);
+        to_msgpack_into(&mut data, payload)
+            .map_err(|_| RhizomeError::Network(NetworkError::General))?;
+        Ok(data)
+    }
+
+    /// Write message header into a buffer with room for `payload_len` bytes
+    fn pack_header(&self, msg_type: u8, msg_id: [u8; 16], payload_len: usize) -> Vec<u8> {
+        let mut data = Vec::with_capacity(HEADER_LEN + payload_len);
+        data.push(msg_type);
+        data.extend_from_slice(&msg_id);
+        data.extend_from_slice(&self.node_id.0);
+        data
+    }
+
+    /// Send our encoded top items and get top items of the node
+    pub async fn exchange_popularity(
+        &self,
+        node: &Node,
+        items: &[u8],
+    ) -> Result<Vec<PopularityItem>, RhizomeError> {
+        let msg_id = self.generate_msg_id();
+        let (tx, rx) = oneshot::channel();
+
+        self.pending_requests.lock().await.insert(msg_id, tx);
+
+        let addr: SocketAddr = format!("{}:{}", node.address, node.port).parse().unwrap();
+
+        let mut data = self.pack_header(MSG_POPULARITY_EXCHANGE, msg_id, items.len());
+        data.extend_from_slice(items);
+        self.transport.send(&data, addr).await?;
+
+        match timeout(self.request_timeout, rx).await {
+            Ok(Ok(response)) if response.msg_type == MSG_POPULARITY_EXCHANGE_RESPONSE => {
+                let response: PopularityItems = decode_payload(response.payload())?;
+                Ok(response.items)
+            }
+            _ => {
+                self.pending_requests.lock().await.remove(&msg_id);
+                Err(RhizomeError::Network(NetworkError::General))
+            }
+        }
     }
 
     /// Get global ranking
     pub async fn get_global_ranking_remote(
         &self,
         node: &Node,
-    ) -> Result<Vec<serde_json::Value>, RhizomeError> {
+    ) -> Result<Vec<PopularityItem>, RhizomeError> {
         let msg_id = self.generate_msg_id();
         let (tx, rx) = tokio::sync::oneshot::channel();
 
@@ -358,17 +456,15 @@ impl NetworkProtocol {
 
         let addr: std::net::SocketAddr = format!("{}:{}", node.address, node.port).parse().unwrap();
 
-        let payload = serde_json::json!({});
-        let data = self.pack_message(MSG_GLOBAL_RANKING_REQUEST, msg_id, payload)?;
+        let data =
+            self.pack_message(MSG_GLOBAL_RANKING_REQUEST, msg_id, &GlobalRankingRequest {})?;
         self.transport.send(&data, addr).await?;
 
         match tokio::time::timeout(self.request_timeout, rx).await {
-            Ok(Ok((msg_type, response_payload))) => {
-                if msg_type == MSG_GLOBAL_RANKING_RESPONSE {
-                    return Ok(response_payload["ranking"]
-                        .as_array()
-                        .cloned()
-                        .unwrap_or_default());
+            Ok(Ok(response)) => {
+                if response.msg_type == MSG_GLOBAL_RANKING_RESPONSE {
+                    let response: GlobalRanking = decode_payload(response.payload())?;
+                    return Ok(response.ranking);
                 }
                 Err(RhizomeError::Network(NetworkError::General))
             }
@@ -385,6 +481,11 @@ impl NetworkProtocol {
     }
 }
 
+/// Decode typed payload of the message
+fn decode_payload<'a, T: Deserialize<'a>>(payload: &'a [u8]) -> Result<T, RhizomeError> {
+    from_msgpack(payload).map_err(|_| RhizomeError::Network(NetworkError::General))
+}
+
 #[async_trait]
 impl NetworkProtocolTrait for NetworkProtocol {
     async fn ping(&self, node: &Node) -> bool {
@@ -394,14 +495,11 @@ impl NetworkProtocolTrait for NetworkProtocol {
         self.pending_requests.lock().await.insert(msg_id, tx);
 
         let addr: SocketAddr = format!("{}:{}", node.address, node.port).parse().unwrap();
-        let payload = serde_json::json!({"node_id": self.node_id.0});
+        let data = self.pack_header(MSG_PING, msg_id, 0);
+        let _ = self.transport.send(&data, addr).await;
 
-        if let Ok(data) = self.pack_message(MSG_PING, msg_id, payload) {
-            let _ = self.transport.send(&data, addr).await;
-
-            if let Ok(Ok((msg_type, _))) = timeout(self.request_timeout, rx).await {
-                return msg_type == MSG_PONG;
-            }
+        if let Ok(Ok(response)) = timeout(self.request_timeout, rx).await {
+            return response.msg_type == MSG_PONG;
         }
 
         self.pending_requests.lock().await.remove(&msg_id);
@@ -421,34 +519,17 @@ impl NetworkProtocolTrait for NetworkProtocol {
         let addr: SocketAddr = format!("{}:{}", remote_node.address, remote_node.port)
             .parse()
             .unwrap();
-        let payload = serde_json::json!({"target_id": target_id.0});
+        let payload = FindNode {
+            target_id: target_id.0,
+        };
 
-        let data = self.pack_message(MSG_FIND_NODE, msg_id, payload)?;
+        let data = self.pack_message(MSG_FIND_NODE, msg_id, &payload)?;
         self.transport.send(&data, addr).await?;
 
         match timeout(self.request_timeout, rx).await {
-            Ok(Ok((msg_type, payload))) if msg_type == MSG_FIND_NODE_RESPONSE => {
-                let mut nodes = Vec::new();
-                if let Some(nodes_arr) = payload.get("nodes").and_then(|v| v.as_array()) {
-                    for n_val in nodes_arr {
-                        if let (Some(id_arr), Some(addr), Some(port)) = (
-                            n_val.get("node_id").and_then(|v| v.as_array()),
-                            n_val.get("address").and_then(|v| v.as_str()),
-                            n_val.get("port").and_then(|v| v.as_u64()),
-                        ) {
-                            let mut id_bytes = [0u8; 20];
-                            for (i, v) in id_arr.iter().enumerate().take(20) {
-                                id_bytes[i] = v.as_u64().unwrap_or(0) as u8;
-                            }
-                            nodes.push(Node::new(
-                                NodeID::new(id_bytes),
-                                addr.to_string(),
-                                port as u16,
-                            ));
-                        }
-                    }
-                }
-                Ok(nodes)
+            Ok(Ok(response)) if response.msg_type == MSG_FIND_NODE_RESPONSE => {
+                let response: Nodes = decode_payload(response.payload())?;
+                Ok(response.nodes.into_iter().map(Node::from).collect())
             }
             _ => {
                 self.pending_requests.lock().await.remove(&msg_id);
@@ -470,22 +551,15 @@ impl NetworkProtocolTrait for NetworkProtocol {
             .parse()
             .unwrap();
 
-        let data = self.pack_message(MSG_FIND_VALUE, msg_id, serde_json::json!({"key": key}))?;
+        let payload = FindValue { key: key.to_vec() };
+        let data = self.pack_message(MSG_FIND_VALUE, msg_id, &payload)?;
         self.transport.send(&data, addr).await?;
 
         match timeout(self.request_timeout, rx).await {
-            Ok(Ok((msg_type, payload))) if msg_type == MSG_FIND_VALUE_RESPONSE => {
-                if payload
-                    .get("found")
-                    .and_then(|v| v.as_bool())
-                    .unwrap_or(false)
-                {
-                    let val: Vec<u8> =
-                        serde_json::from_value(payload.get("value").cloned().unwrap_or_default())
-                            .unwrap_or_default();
-                    Ok(Some(val))
-                } else {
-                    Ok(None)
+            Ok(Ok(response)) if response.msg_type == MSG_FIND_VALUE_RESPONSE => {
+                match decode_payload(response.payload()) {
+                    Ok(FindValueResult::Found(val, _)) => Ok(Some(val)),
+                    _ => Ok(None),
                 }
             }
             _ => {
@@ -495,6 +569,45 @@ impl NetworkProtocolTrait for NetworkProtocol {
         }
     }
 
+    /// Peer already puts its closest nodes in FIND_VALUE response on miss,
+    /// so one request gives the value or the next hops
+    async fn find_value_and_neighbors(
+        &self,
+        key: &[u8],
+        _target_id: &NodeID,
+        remote_node: &Node,
+    ) -> Result<(Option<(Vec<u8>, Duration)>, Vec<Node>), RhizomeError> {
+        let msg_id = self.generate_msg_id();
+        let (tx, rx) = oneshot::channel();
+
+        self.pending_requests.lock().await.insert(msg_id, tx);
+        let addr: SocketAddr = format!("{}:{}", remote_node.address, remote_node.port)
+            .parse()
+            .unwrap();
+
+        let payload = FindValue { key: key.to_vec() };
+        let data = self.pack_message(MSG_FIND_VALUE, msg_id, &payload)?;
+        self.transport.send(&data, addr).await?;
+
+        match timeout(self.request_timeout, rx).await {
+            Ok(Ok(response)) if response.msg_type == MSG_FIND_VALUE_RESPONSE => {
+                match decode_payload(response.payload())? {
+                    FindValueResult::Found(val, ttl_left) => Ok((
+                        Some((val, Duration::from_secs(u64::from(ttl_left)))),
+                        Vec::new(),
+                    )),
+                    FindValueResult::Nodes(nodes) => {
+                        Ok((None, nodes.into_iter().map(Node::from).collect()))
+                    }
+                }
+            }
+            _ => {
+                self.pending_requests.lock().await.remove(&msg_id);
+                Err(RhizomeError::Network(NetworkError::General))
+            }
+        }
+    }
+
     async fn store(
         &self,
         key: &[u8],
@@ -510,15 +623,18 @@ impl NetworkProtocolTrait for NetworkProtocol {
             .parse()
             .unwrap();
 
-        let payload = serde_json::json!({"key": key, "value": value, "ttl": ttl});
-        let data = self.pack_message(MSG_STORE, msg_id, payload)?;
+        let payload = Store {
+            key: key.to_vec(),
+            value: value.to_vec(),
+            ttl,
+        };
+        let data = self.pack_message(MSG_STORE, msg_id, &payload)?;
         self.transport.send(&data, addr).await?;
 
         match timeout(self.request_timeout, rx).await {
-            Ok(Ok((msg_type, payload))) if msg_type == MSG_STORE_RESPONSE => Ok(payload
-                .get("success")
-                .and_then(|v| v.as_bool())
-                .unwrap_or(false)),
+            Ok(Ok(response)) if response.msg_type == MSG_STORE_RESPONSE => {
+                Ok(decode_payload::<StoreResult>(response.payload()).is_ok_and(|r| r.success))
+            }
             _ => {
                 self.pending_requests.lock().await.remove(&msg_id);
                 Ok(false)
@@ -1,24 +1,57 @@
+use socket2::{Domain, Protocol, Socket, Type};
+use std::io::ErrorKind;
 use std::net::SocketAddr;
 use std::sync::Arc;
 use std::sync::atomic::{AtomicBool, Ordering};
+use std::time::Instant;
 use tokio::net::UdpSocket;
+use tokio::sync::mpsc::{self, error::TrySendError};
 use tokio::sync::{Mutex, oneshot};
-use tracing::{error, info};
+use tracing::{error, info, warn};
 
 use crate::exceptions::{NetworkError, RhizomeError};
-use crate::utils::time::get_now_f64;
 
 /// Raw Message
 ///
 /// Data without serialization yet
+///
+/// Datagram never grows after receiving, so it is kept as a boxed slice without capacity
 #[derive(Debug, Clone)]
 pub struct Message {
     /// Transferred data
-    pub data: Vec<u8>,
+    pub data: Box<[u8]>,
     /// IP + port of node
     pub address: SocketAddr,
-    /// Time of getting message
-    pub timestamp: f64,
+    /// Time of getting message, monotonic clock
+    pub timestamp: Instant,
+}
+
+/// Size of kernel receive and send buffers of the socket
+///
+/// Default one _(~200 KB on Linux)_ overflows on bootstrap bursts and datagrams are dropped
+const SOCKET_BUFFER_SIZE: usize = 8 * 1024 * 1024;
+
+/// Capacity of the queue between the socket reader and handlers
+const RECEIVE_QUEUE_SIZE: usize = 4096;
+
+/// Number of tasks which handle received datagrams
+const RECEIVE_WORKERS: usize = 8;
+
+/// Max datagrams read in a row after the socket became readable
+const RECEIVE_BATCH: usize = 64;
+
+/// Pass received datagram to the handlers queue
+///
+/// Reader never waits for handlers, burst over the queue is dropped
+fn enqueue(queue: &mpsc::Sender<Message>, data: &[u8], address: SocketAddr) {
+    let msg = Message {
+        data: Box::from(data),
+        address,
+        timestamp: Instant::now(),
+    };
+    if let Err(TrySendError::Full(msg)) = queue.try_send(msg) {
+        warn!(address = %msg.address, "Receive queue is full, datagram dropped");
+    }
 }
 
 /// Main UDP structure
@@ -63,7 +96,7 @@ impl UDPTransport {
         }
 
         let addr = format!("{}:{}", self.host, self.port);
-        let socket = UdpSocket::bind(&addr).await.map_err(|e| {
+        let socket = Self::bind(&addr).await.map_err(|e| {
             error!("Failed to bind socket: {}", e);
             RhizomeError::Network(NetworkError::General)
         })?;
@@ -82,6 +115,22 @@ impl UDPTransport {
         }
 
         let handler = Arc::new(handler);
+        let (queue_tx, queue_rx) = mpsc::channel::<Message>(RECEIVE_QUEUE_SIZE);
+        let queue_rx = Arc::new(Mutex::new(queue_rx));
+
+        // Workers end when the receive loop stops and drops the sender
+        for _ in 0..RECEIVE_WORKERS {
+            let queue_rx = queue_rx.clone();
+            let h = handler.clone();
+            tokio::spawn(async move {
+                loop {
+                    let Some(msg) = queue_rx.lock().await.recv().await else {
+                        break;
+                    };
+                    h(msg).await;
+                }
+            });
+        }
 
         tokio::spawn(async move {
             let mut buf = vec![0u8; 65535];
@@ -94,15 +143,20 @@ impl UDPTransport {
                     result = socket_arc.recv_from(&mut buf) => {
                         match result {
                             Ok((size, addr)) => {
-                                let data = buf[..size].to_vec();
-                                let timestamp = get_now_f64();
-
-                                let msg = Message { data, address: addr, timestamp };
-                                let h = handler.clone();
-
-                                tokio::spawn(async move {
-                                    h(msg).await;
-                                });
+                                enqueue(&queue_tx, &buf[..size], addr);
+
+                                // Datagrams already in the kernel buffer are read without
+                                // going back through readiness wait for each of them
+                                for _ in 1..RECEIVE_BATCH {
+                                    match socket_arc.try_recv_from(&mut buf) {
+                                        Ok((size, addr)) => enqueue(&queue_tx, &buf[..size], addr),
+                                        Err(e) if e.kind() == ErrorKind::WouldBlock => break,
+                                        Err(e) => {
+                                            error!("UDP receive error: {}", e);
+                                            break;
+                                        }
+                                    }
+                                }
                             }
                             Err(e) => {
                                 error!("UDP receive error: {}", e);
@@ -118,6 +172,26 @@ impl UDPTransport {
         Ok(())
     }
 
+    /// Bind UDP socket with enlarged kernel buffers
+    async fn bind(addr: &str) -> std::io::Result<UdpSocket> {
+        let addr = tokio::net::lookup_host(addr).await?.next().ok_or_else(|| {
+            std::io::Error::new(std::io::ErrorKind::InvalidInput, "no address to bind")
+        })?;
+
+        let socket = Socket::new(Domain::for_address(addr), Type::DGRAM, Some(Protocol::UDP))?;
+        // OS may cap the size, smaller buffer is not a reason to fail start
+        if let Err(e) = socket.set_recv_buffer_size(SOCKET_BUFFER_SIZE) {
+            warn!(error = %e, "Failed to enlarge UDP receive buffer");
+        }
+        if let Err(e) = socket.set_send_buffer_size(SOCKET_BUFFER_SIZE) {
+            warn!(error = %e, "Failed to enlarge UDP send buffer");
+        }
+        socket.set_nonblocking(true)?;
+        socket.bind(&addr.into())?;
+
+        UdpSocket::from_std(socket.into())
+    }
+
     /// Stop the UDP transport
     pub async fn stop(&self) {
         if !self.is_running.load(Ordering::SeqCst) {
@@ -146,8 +220,9 @@ impl UDPTransport {
             return Err(RhizomeError::Network(NetworkError::General));
         }
 
-        let socket_lock = self.socket.lock().await;
-        if let Some(socket) = socket_lock.as_ref() {
+        // Socket is cloned out of the lock, so concurrent sends don't queue on the mutex
+        let socket = self.socket.lock().await.clone();
+        if let Some(socket) = socket {
             match socket.send_to(data, address).await {
                 Ok(_) => Ok(true),
                 Err(e) => {
@@ -1,15 +1,17 @@
+use futures::future::join_all;
 use rand::Rng;
 use std::fmt;
-use std::path::PathBuf;
+use std::net::SocketAddr;
 use std::sync::Arc;
 use std::time::Duration;
-use tokio::sync::RwLock;
+use tokio::sync::{Mutex, RwLock, watch};
+use tokio::task::JoinSet;
 use tracing::{debug, error, info, warn};
 
 use crate::config::Config;
 use crate::dht::node::{Node, NodeID};
 use crate::dht::protocol::{DHTProtocol, NetworkProtocolTrait};
-use crate::dht::routing_table::RoutingTable;
+use crate::dht::routing_table::{KBucket, RoutingTable};
 use crate::exceptions::RhizomeError;
 use crate::network::protocol::NetworkProtocol;
 use crate::network::transport::UDPTransport;
@@ -50,6 +52,41 @@ impl fmt::Display for NodeType {
     }
 }
 
+impl NodeType {
+    /// Resource limits of the node type: max storage bytes and bucket size
+    ///
+    /// Node types differ only by this table, so one `BaseNode` serves all of them
+    fn limits(self) -> (Option<u64>, Option<i32>) {
+        match self {
+            NodeType::Seed | NodeType::Full => (None, None),
+            NodeType::Light => (Some(1024 * 1024 * 1024), None),
+            NodeType::Mobile => (Some(100 * 1024 * 1024), Some(10)),
+        }
+    }
+
+    /// Put limits of the node type over the config
+    fn apply_limits(self, config: &mut Config) {
+        let (max_storage_size, k) = self.limits();
+        if let Some(max) = max_storage_size {
+            config.storage.max_storage_size = config.storage.max_storage_size.min(max);
+        }
+        if let Some(k) = k {
+            config.dht.k = k;
+        }
+    }
+}
+
+/// State of the node UDP socket
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum ListenState {
+    /// Not started yet or stopped
+    Idle,
+    /// Socket is bound
+    Listening,
+    /// Last start failed before the socket was bound
+    Failed,
+}
+
 /// Type for Facade base node
 pub struct BaseNode {
     /// Ref to the client config
@@ -80,6 +117,24 @@ pub struct BaseNode {
     pub is_running: Arc<RwLock<bool>>,
     /// Time of node start
     pub start_time: Arc<RwLock<Option<f64>>>,
+    /// State of UDP socket, other tasks can wait for it
+    pub listening: watch::Sender<ListenState>,
+    /// Bootstrap addresses parsed once from `network.bootstrap_nodes`
+    pub bootstrap_addrs: Vec<SocketAddr>,
+    /// Background loops of the node, joined on stop
+    pub(crate) background_tasks: Mutex<JoinSet<()>>,
+}
+
+/// How long stop waits for background loops before aborting them
+const STOP_GRACE: Duration = Duration::from_secs(5);
+/// Period of freshness recount for all metrics
+const FRESHNESS_INTERVAL: Duration = Duration::from_secs(60);
+/// Buckets refreshed by random lookups, deeper ones are covered by one self lookup
+const REFRESH_BUCKETS: usize = 16;
+
+/// Interval from config seconds, at least one second
+pub(crate) fn interval_secs(secs: i32) -> Duration {
+    Duration::from_secs(secs.max(1) as u64)
 }
 
 #[allow(dead_code)]
@@ -103,9 +158,11 @@ impl BaseNode {
             "light" => NodeType::Light,
             _ => NodeType::Mobile,
         };
+        // Limits go after detection too, auto detected light node gets the same caps
+        node_type.apply_limits(&mut config);
 
-        let node_id_path = PathBuf::from(&config.node.node_id_file);
-        let node_id_bytes = match load_node_id(&node_id_path) {
+        let node_id_path = config.node.node_id_file.as_path();
+        let node_id_bytes = match load_node_id(node_id_path) {
             Some(bytes) => {
                 info!(path = ?node_id_path, "Node ID loaded from file");
                 bytes
@@ -113,7 +170,7 @@ impl BaseNode {
             None => {
                 info!("Generating new node ID");
                 let bytes = generate_node_id().to_vec();
-                save_node_id(&bytes, &node_id_path)?;
+                save_node_id(&bytes, node_id_path)?;
                 bytes
             }
         };
@@ -141,7 +198,20 @@ impl BaseNode {
             config.popularity.active_threshold,
         ));
 
-        let listen_addr: std::net::SocketAddr = format!(
+        let bootstrap_addrs: Vec<SocketAddr> = config
+            .network
+            .bootstrap_nodes
+            .iter()
+            .filter_map(|addr_str| match addr_str.parse() {
+                Ok(addr) => Some(addr),
+                Err(_) => {
+                    warn!(address = %addr_str, "Invalid bootstrap node address skipped");
+                    None
+                }
+            })
+            .collect();
+
+        let listen_addr: SocketAddr = format!(
             "{}:{}",
             config.network.listen_host, config.network.listen_port
         )
@@ -189,6 +259,9 @@ impl BaseNode {
             replicator,
             is_running: Arc::new(RwLock::new(false)),
             start_time: Arc::new(RwLock::new(None)),
+            listening: watch::Sender::new(ListenState::Idle),
+            bootstrap_addrs,
+            background_tasks: Mutex::new(JoinSet::new()),
         })
     }
 
@@ -223,25 +296,55 @@ impl BaseNode {
 
         *running = true;
         *self.start_time.write().await = Some(get_now_f64());
+        // Failure of the previous start must not answer waiters of this one
+        self.listening.send_replace(ListenState::Idle);
 
         let net = self.network_protocol.clone();
-        net.start().await?;
+        if let Err(e) = net.start().await {
+            *running = false;
+            self.listening.send_replace(ListenState::Failed);
+            return Err(e.into());
+        }
+        self.listening.send_replace(ListenState::Listening);
 
         self.bootstrap().await;
 
+        let mut tasks = self.background_tasks.lock().await;
+
         let node_ref = Arc::new(self.clone_ptrs());
-        tokio::spawn(async move {
-            Self::background_loop(node_ref).await;
-        });
+        tasks.spawn(Self::background_loop(node_ref.clone()));
 
-        let node_ref_pop = Arc::new(self.clone_ptrs());
-        tokio::spawn(async move {
-            Self::popularity_loop(node_ref_pop).await;
-        });
+        let popularity = &self.config.popularity;
+        tasks.spawn(Self::periodic(
+            node_ref.clone(),
+            interval_secs(popularity.update_interval),
+            Self::update_popularity,
+        ));
+        tasks.spawn(Self::periodic(
+            node_ref.clone(),
+            interval_secs(popularity.exchange_interval),
+            Self::exchange_with_neighbors,
+        ));
+        tasks.spawn(Self::periodic(
+            node_ref,
+            FRESHNESS_INTERVAL,
+            Self::update_freshness,
+        ));
 
         Ok(())
     }
 
+    /// Wait until the UDP socket of the node is bound
+    ///
+    /// Returns right after binding, it does not wait for bootstrap.
+    /// `false` means the start failed, so waiters don't hang on a dead node
+    pub async fn wait_listening(&self) -> bool {
+        let mut rx = self.listening.subscribe();
+        rx.wait_for(|state| *state != ListenState::Idle)
+            .await
+            .is_ok_and(|state| *state == ListenState::Listening)
+    }
+
     /// Stop the socket and leave all resources
     pub async fn stop(&self) -> Result<(), Box<dyn std::error::Error>> {
         let mut running = self.is_running.write().await;
@@ -251,8 +354,12 @@ impl BaseNode {
 
         info!("Stopping node");
         *running = false;
+        // Loops read the flag on exit, lock is released before waiting for them
+        drop(running);
 
         self.network_protocol.clone().stop().await;
+        self.listening.send_replace(ListenState::Idle);
+        self.join_background_tasks().await;
 
         if let Err(e) = self.save_state().await {
             error!(error = %e, "Failed to save node state during stop");
@@ -262,9 +369,28 @@ impl BaseNode {
         Ok(())
     }
 
+    /// Wait for background loops to finish, the stuck ones are aborted after `STOP_GRACE`
+    async fn join_background_tasks(&self) {
+        let mut tasks = self.background_tasks.lock().await;
+
+        let drain = async {
+            while let Some(result) = tasks.join_next().await {
+                if let Err(e) = result
+                    && e.is_panic()
+                {
+                    error!(error = %e, "Background task panicked");
+                }
+            }
+        };
+        if tokio::time::timeout(STOP_GRACE, drain).await.is_err() {
+            warn!("Background tasks did not stop in time, aborting them");
+            tasks.abort_all();
+        }
+    }
+
     /// Save node state in JSON format
     async fn save_state(&self) -> Result<(), Box<dyn std::error::Error>> {
-        let state_file = PathBuf::from(&self.config.node.state_file);
+        let state_file = self.config.node.state_file.as_path();
 
         if let Some(parent) = state_file.parent() {
             std::fs::create_dir_all(parent)?;
@@ -294,7 +420,7 @@ impl BaseNode {
 
     /// Load node state from JSON
     pub async fn load_state(&self) -> Result<(), Box<dyn std::error::Error>> {
-        let state_file = PathBuf::from(&self.config.node.state_file);
+        let state_file = self.config.node.state_file.as_path();
         if !state_file.exists() {
             return Ok(());
         }
@@ -319,53 +445,64 @@ impl BaseNode {
 
     /// Connecting to the start nodes
     async fn bootstrap(&self) {
-        let bootstrap_nodes = &self.config.network.bootstrap_nodes;
-        if bootstrap_nodes.is_empty() {
+        if self.bootstrap_addrs.is_empty() {
             warn!("No bootstrap nodes configured");
             return;
         }
 
-        for addr_str in bootstrap_nodes {
-            if let Ok(addr) = addr_str.parse::<std::net::SocketAddr>() {
-                let boot_node =
-                    Node::new(NodeID::new([0u8; 20]), addr.ip().to_string(), addr.port());
+        let boot_nodes: Vec<Node> = self
+            .bootstrap_addrs
+            .iter()
+            .map(|addr| Node::new(NodeID::new([0u8; 20]), addr.ip().to_string(), addr.port()))
+            .collect();
 
-                if self.network_protocol.ping(&boot_node).await {
-                    info!(address = %addr_str, "Bootstrap node connected");
-                    self.routing_table.write().await.add_node(boot_node);
+        // All bootstrap nodes are pinged at once, slow or dead ones don't delay the rest
+        let alive = join_all(boot_nodes.iter().map(|n| self.network_protocol.ping(n))).await;
 
-                    let _ = self.dht_protocol.find_node(&self.node_id).await;
+        let mut connected = 0;
+        {
+            let mut rt = self.routing_table.write().await;
+            for (boot_node, is_alive) in boot_nodes.into_iter().zip(alive) {
+                if is_alive {
+                    info!(address = %boot_node.address, port = boot_node.port, "Bootstrap node connected");
+                    rt.add_node(boot_node);
+                    connected += 1;
                 }
             }
         }
+
+        // One lookup starts from all connected nodes, it already queries them `alpha` at a time
+        if connected > 0 {
+            let _ = self.dht_protocol.find_node(&self.node_id).await;
+        }
     }
 
     /// Exchange data between nodes
     pub async fn exchange_popularity(&self) -> Result<(), RhizomeError> {
-        let all_metrics = self
+        if self
             .metrics_collector
             .read()
             .await
             .get_all_metrics()
-            .clone();
-        if all_metrics.is_empty() {
+            .is_empty()
+        {
             return Ok(());
         }
 
-        let neighbor_nodes = {
+        let neighbor_nodes: Vec<Node> = {
             let rt = self.routing_table.read().await;
-            let mut nodes = rt.get_all_nodes();
-            nodes.truncate(10);
-            nodes
+            rt.iter_all_nodes().take(10).cloned().collect()
         };
 
         if neighbor_nodes.is_empty() {
             return Ok(());
         }
 
-        self.popularity_exchanger
-            .exchange_top_items(all_metrics, neighbor_nodes.clone(), 100)
+        let delta = self
+            .popularity_exchanger
+            .exchange_top_items(&neighbor_nodes)
             .await;
+        self.metrics_collector.write().await.merge(delta);
 
         info!(
             neighbors = neighbor_nodes.len(),
@@ -383,17 +520,35 @@ impl BaseNode {
                 debug!(count = deleted, "Cleaned up expired data");
             }
 
-            let refresh_interval = node.config.dht.refresh_interval as f64;
+            let refresh_interval = interval_secs(node.config.dht.refresh_interval);
             let mut buckets_to_refresh = Vec::new();
+            let mut self_lookup = None;
 
             {
                 let rt = node.routing_table.read().await;
-                let now = get_now_f64();
-                for (i, bucket) in rt.buckets.iter().enumerate() {
-                    if !bucket.nodes.is_empty() && (now - bucket.last_updated) > refresh_interval {
+                let is_stale = |bucket: &KBucket| {
+                    !bucket.nodes.is_empty() && bucket.last_updated.elapsed() > refresh_interval
+                };
+                // Deeper buckets are empty almost always, nothing to walk after the last filled one
+                let populated = rt
+                    .buckets
+                    .iter()
+                    .rposition(|bucket| !bucket.nodes.is_empty())
+                    .map_or(0, |last| last + 1);
+
+                for (i, bucket) in rt.buckets[..populated.min(REFRESH_BUCKETS)]
+                    .iter()
+                    .enumerate()
+                {
+                    if is_stale(bucket) {
                         buckets_to_refresh.push(i);
                     }
                 }
+                if populated > REFRESH_BUCKETS
+                    && rt.buckets[REFRESH_BUCKETS..populated].iter().any(is_stale)
+                {
+                    self_lookup = Some(rt.node_id);
+                }
             }
 
             for idx in buckets_to_refresh {
@@ -402,59 +557,67 @@ impl BaseNode {
                 debug!(index = idx, "Bucket refreshed");
             }
 
-            tokio::time::sleep(Duration::from_secs(60)).await;
+            if let Some(node_id) = self_lookup {
+                let _ = node.dht_protocol.find_node(&node_id).await;
+                debug!("Deep buckets refreshed by self lookup");
+            }
+
+            if !node.idle(Duration::from_secs(60)).await {
+                break;
+            }
         }
     }
 
-    /// Main fron loop which work with metrics
-    async fn popularity_loop(node: Arc<BaseNodePtrs>) {
-        let mut last_update = 0.0;
-        let mut last_exchange = 0.0;
-
+    /// Run `job` at once and then every `period` until the node stops
+    ///
+    /// Every job sleeps its own interval, so no loop wakes up just to compare timestamps
+    pub(crate) async fn periodic<F, Fut>(node: Arc<BaseNodePtrs>, period: Duration, job: F)
+    where
+        F: Fn(Arc<BaseNodePtrs>) -> Fut,
+        Fut: Future<Output = ()>,
+    {
         while *node.is_running.read().await {
-            let now = get_now_f64();
-
-            if now - last_update >= node.config.popularity.update_interval as f64 {
-                let metrics = node
-                    .metrics_collector
-                    .read()
-                    .await
-                    .get_all_metrics()
-                    .clone();
-                let ranked = node.popularity_ranker.rank_items(&metrics, Some(100));
-
-                for item in &ranked {
-                    if item.score >= node.config.popularity.popularity_threshold {
-                        let _ = node.storage.extend_ttl(item.key.clone(), 1.0).await;
-                    }
-                }
+            job(node.clone()).await;
 
-                node.replicator
-                    .replicate_popular_items(ranked, node.config.popularity.popularity_threshold)
-                    .await;
-
-                last_update = now;
+            if !node.idle(period).await {
+                break;
             }
+        }
+    }
 
-            if now - last_exchange >= node.config.popularity.exchange_interval as f64 {
-                let metrics = node
-                    .metrics_collector
-                    .read()
-                    .await
-                    .get_all_metrics()
-                    .clone();
-                let neighbors = node.routing_table.read().await.get_all_nodes();
-
-                node.popularity_exchanger
-                    .exchange_top_items(metrics, neighbors, 100)
-                    .await;
-                last_exchange = now;
-            }
+    /// Extend TTL of popular items and replicate them
+    async fn update_popularity(node: Arc<BaseNodePtrs>) {
+        let ranked = {
+            let collector = node.metrics_collector.read().await;
+            collector.get_top(&node.popularity_ranker, 100)
+        };
 
-            node.metrics_collector.write().await.update_all_freshness();
+        let popular: Vec<(Vec<u8>, f64)> = ranked
+            .iter()
+            .filter(|item| item.score >= node.config.popularity.popularity_threshold)
+            .map(|item| (item.key.clone(), 1.0))
+            .collect();
+        let _ = node.storage.extend_ttl_bulk(popular).await;
 
-            tokio::time::sleep(Duration::from_secs(60)).await;
-        }
+        node.replicator
+            .replicate_popular_items(ranked, node.config.popularity.popularity_threshold)
+            .await;
+    }
+
+    /// Exchange top items with all known nodes
+    async fn exchange_with_neighbors(node: Arc<BaseNodePtrs>) {
+        let neighbors = node.routing_table.read().await.get_all_nodes();
+
+        let delta = node
+            .popularity_exchanger
+            .exchange_top_items(&neighbors)
+            .await;
+        node.metrics_collector.write().await.merge(delta);
+    }
+
+    /// Recount freshness of all metrics
+    async fn update_freshness(node: Arc<BaseNodePtrs>) {
+        node.metrics_collector.write().await.update_all_freshness();
     }
 
     /// Generate uniq id for Kademlia Bucket
@@ -504,6 +667,23 @@ impl BaseNode {
         Ok(success)
     }
 
+    pub async fn store_many(
+        &self,
+        items: &[(Vec<u8>, Vec<u8>, i32)],
+    ) -> Result<Vec<bool>, RhizomeError> {
+        let results = self.dht_protocol.store_many(items).await?;
+        let mut collector = self.metrics_collector.write().await;
+        for ((key, _, _), success) in items.iter().zip(&results) {
+            let replication_count = if *success {
+                self.config.dht.k as u32
+            } else {
+                1
+            };
+            collector.record_store(key.clone(), replication_count);
+        }
+        Ok(results)
+    }
+
     /// Method for copy packet references
     pub(crate) fn clone_ptrs(&self) -> BaseNodePtrs {
         BaseNodePtrs {
@@ -516,6 +696,7 @@ impl BaseNode {
             popularity_exchanger: self.popularity_exchanger.clone(),
             replicator: self.replicator.clone(),
             is_running: self.is_running.clone(),
+            listening: self.listening.subscribe(),
         }
     }
 }
@@ -531,9 +712,22 @@ pub(crate) struct BaseNodePtrs {
     pub(crate) popularity_exchanger: Arc<PopularityExchanger>,
     replicator: Arc<Replicator>,
     pub(crate) is_running: Arc<RwLock<bool>>,
+    /// State of UDP socket, it leaves `Listening` on stop
+    listening: watch::Receiver<ListenState>,
 }
 
 impl BaseNodePtrs {
+    /// Sleep for `period` or until the node stops
+    ///
+    /// Returns `false` when the node was stopped, so loops exit without waiting out the period
+    pub(crate) async fn idle(&self, period: Duration) -> bool {
+        let mut listening = self.listening.clone();
+        tokio::select! {
+            _ = tokio::time::sleep(period) => true,
+            _ = listening.wait_for(|state| *state != ListenState::Listening) => false,
+        }
+    }
+
     fn generate_random_id_for_bucket(&self, _bucket_index: usize) -> NodeID {
         NodeID::new([0u8; 20])
     }
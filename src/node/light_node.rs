@@ -12,14 +12,10 @@ impl LightNode {
     /// Constructor for node of light type
     ///
     /// Guarantied that node type is light and max_storage_bytes is 1GB.
+    /// Limits come from `NodeType` table in `BaseNode::new`
     pub async fn new(mut config: Config) -> Result<Self, Box<dyn std::error::Error>> {
         config.node.node_type = "light".to_string();
 
-        let max_light_bytes: u64 = 1024 * 1024 * 1024;
-        if config.storage.max_storage_size > max_light_bytes {
-            config.storage.max_storage_size = max_light_bytes;
-        }
-
         let base = BaseNode::new(config).await?;
 
         Ok(Self { base })
@@ -12,14 +12,10 @@ impl MobileNode {
     /// Constructor for node of full type
     ///
     /// Guarantied that node type is mobile, max storage is 100mb and max buckets count is 10.
+    /// Limits come from `NodeType` table in `BaseNode::new`
     pub async fn new(mut config: Config) -> Result<Self, Box<dyn std::error::Error>> {
         config.node.node_type = "mobile".to_string();
 
-        let max_mobile_bytes: u64 = 100 * 1024 * 1024;
-        config.storage.max_storage_size = config.storage.max_storage_size.min(max_mobile_bytes);
-
-        config.dht.k = 10;
-
         let base = BaseNode::new(config).await?;
 
         Ok(Self { base })
@@ -1,12 +1,9 @@
 use std::ops::Deref;
 use std::sync::Arc;
-use std::time::Duration;
-use tokio::time::sleep;
 use tracing::{error, info};
 
 use crate::config::Config;
-use crate::node::base_node::{BaseNode, BaseNodePtrs};
-use crate::utils::time::get_now_f64;
+use crate::node::base_node::{BaseNode, BaseNodePtrs, interval_secs};
 
 /// Seed-node for work with popularity
 pub struct SeedNode {
@@ -28,52 +25,35 @@ impl SeedNode {
 
         let base_ptrs = Arc::new(self.base.clone_ptrs());
 
-        tokio::spawn(async move {
-            Self::seed_loop(base_ptrs).await;
-        });
+        let period = interval_secs(base_ptrs.config.popularity.global_update_interval);
+        self.base
+            .background_tasks
+            .lock()
+            .await
+            .spawn(BaseNode::periodic(base_ptrs, period, Self::seed_job));
 
         info!("Seed-specific tasks started");
         Ok(())
     }
 
-    async fn seed_loop(node: Arc<BaseNodePtrs>) {
-        let global_update_interval = node.config.popularity.global_update_interval as f64;
-        let mut last_global_update = 0.0;
-
-        while *node.is_running.read().await {
-            let current_time = get_now_f64();
-
-            if current_time - last_global_update >= global_update_interval {
-                if let Err(e) = Self::update_global_ranking(&node).await {
-                    error!(error = %e, "Error updating global ranking in seed task");
-                }
-                last_global_update = current_time;
-            }
-
-            sleep(Duration::from_secs(300)).await;
+    /// Recount global ranking, runs every `global_update_interval`
+    async fn seed_job(node: Arc<BaseNodePtrs>) {
+        if let Err(e) = Self::update_global_ranking(&node).await {
+            error!(error = %e, "Error updating global ranking in seed task");
         }
     }
 
     async fn update_global_ranking(node: &BaseNodePtrs) -> Result<(), Box<dyn std::error::Error>> {
-        let all_metrics = node
-            .metrics_collector
-            .read()
-            .await
-            .get_all_metrics()
-            .clone();
-        if all_metrics.is_empty() {
+        let local_ranked = {
+            let collector = node.metrics_collector.read().await;
+            collector.get_top(&node.popularity_ranker, 100)
+        };
+        if local_ranked.is_empty() {
             return Ok(());
         }
 
-        let local_ranked = node.popularity_ranker.rank_items(&all_metrics, Some(100));
-
-        let mut seed_nodes = Vec::new();
-        let all_nodes = node.routing_table.read().await.get_all_nodes();
-
         // TODO: filter node like seed by metadata or other bucket
-        for n in all_nodes {
-            seed_nodes.push(n);
-        }
+        let seed_nodes = node.routing_table.read().await.get_all_nodes();
 
         let global_ranking = node
             .popularity_exchanger
@@ -1,15 +1,28 @@
+use futures::stream::{FuturesUnordered, StreamExt};
 use serde_json::{Value, json};
 use std::collections::HashMap;
 use std::sync::Arc;
+use std::time::{Duration, Instant};
 use tokio::sync::RwLock;
 use tracing::{info, warn};
 
 use crate::dht::node::Node;
+use crate::network::messages::{PopularityItem, PopularityItems};
 use crate::network::protocol::NetworkProtocol;
 use crate::popularity::metrics::{MetricsCollector, PopularityMetrics};
 use crate::popularity::ranking::{PopularityRanker, RankedItem};
+use crate::utils::serialization::to_msgpack;
 use crate::utils::time::get_now_f64;
 
+/// Items sent to one peer in popularity exchange
+const EXCHANGE_TOP_N: usize = 100;
+/// Neighbors asked at once in one exchange round
+const EXCHANGE_NEIGHBORS: usize = 5;
+/// How long the encoded exchange answer is reused for other peers
+const EXCHANGE_PAYLOAD_TTL: Duration = Duration::from_secs(30);
+/// Size of the aggregated global ranking
+const GLOBAL_TOP: usize = 100;
+
 /// Structure for exchange popularity nodes
 pub struct PopularityExchanger {
     /// Protocol for Access to the UDP
@@ -22,6 +35,8 @@ pub struct PopularityExchanger {
     global_ranking: RwLock<Vec<RankedItem>>,
     /// Last update of the global ranking
     global_ranking_updated: RwLock<f64>,
+    /// Encoded top items for exchange answers and the time it was built
+    exchange_payload: RwLock<Option<(Instant, Arc<[u8]>)>>,
 }
 
 impl PopularityExchanger {
@@ -36,9 +51,40 @@ impl PopularityExchanger {
             metrics_collector,
             global_ranking: RwLock::new(Vec::new()),
             global_ranking_updated: RwLock::new(0.0),
+            exchange_payload: RwLock::new(None),
         }
     }
 
+    /// Msgpack of our top items for `MSG_POPULARITY_EXCHANGE_RESPONSE`
+    ///
+    /// Peers asking in the same exchange round get one encoded payload,
+    /// it is rebuilt after TTL or when received items change metrics
+    pub async fn exchange_payload(&self) -> Option<Arc<[u8]>> {
+        if let Some((built_at, payload)) = self.exchange_payload.read().await.as_ref()
+            && built_at.elapsed() < EXCHANGE_PAYLOAD_TTL
+        {
+            return Some(payload.clone());
+        }
+
+        let collector = self.metrics_collector.as_ref()?.read().await;
+        let ranked = collector.get_top(&self.ranker, EXCHANGE_TOP_N);
+        drop(collector);
+
+        let items = PopularityItems {
+            items: ranked.iter().map(PopularityItem::from).collect(),
+        };
+        let payload: Arc<[u8]> = match to_msgpack(&items) {
+            Ok(data) => data.into(),
+            Err(e) => {
+                warn!(error = %e, "Failed to encode popularity exchange payload");
+                return None;
+            }
+        };
+
+        *self.exchange_payload.write().await = Some((Instant::now(), payload.clone()));
+        Some(payload)
+    }
+
     /// Collect local metrics
     pub async fn get_local_metrics(&self) -> Option<HashMap<Vec<u8>, PopularityMetrics>> {
         let collector_lock = self.metrics_collector.as_ref()?;
@@ -48,102 +94,96 @@ impl PopularityExchanger {
     }
 
     /// Exchange top-N elements with neighbor nodes
+    ///
+    /// Our items are the cached `exchange_payload`, answers are merged as they come,
+    /// so a slow neighbor doesn't hold the others. Returns only metrics which received
+    /// items add or change, callers merge them into the collector
     pub async fn exchange_top_items(
         &self,
-        local_metrics: HashMap<Vec<u8>, PopularityMetrics>,
-        neighbor_nodes: Vec<Node>,
-        top_n: usize,
+        neighbor_nodes: &[Node],
     ) -> HashMap<Vec<u8>, PopularityMetrics> {
-        let local_ranked = self.ranker.rank_items(&local_metrics, Some(top_n));
-
-        let exchange_data: Vec<Value> = local_ranked
-            .iter()
-            .map(|item| {
-                json!({
-                    "key": hex::encode(&item.key),
-                    "score": item.score,
-                    "metrics": item.metrics.to_dict()
-                })
-            })
-            .collect();
-
+        let Some(collector_lock) = &self.metrics_collector else {
+            return HashMap::new();
+        };
         if neighbor_nodes.is_empty() {
-            return local_metrics;
+            return HashMap::new();
         }
 
-        let mut tasks = Vec::new();
-        for _node in neighbor_nodes.iter().take(5) {
-            tasks.push(exchange_data.clone());
-        }
+        let Some(exchange_data) = self.exchange_payload().await else {
+            return HashMap::new();
+        };
 
-        let results = tasks;
+        let mut in_flight: FuturesUnordered<_> = neighbor_nodes
+            .iter()
+            .take(EXCHANGE_NEIGHBORS)
+            .map(|node| {
+                self.network_protocol
+                    .exchange_popularity(node, &exchange_data)
+            })
+            .collect();
 
-        let mut updated_metrics = local_metrics;
+        let mut delta = HashMap::new();
         let mut received_count = 0;
 
-        for result in results {
-            let received_items = result;
-            {
-                received_count += received_items.len();
-                for item_val in received_items {
-                    if let Err(e) = self.process_single_item(&mut updated_metrics, item_val) {
-                        warn!(error = %e, "Error processing received item during exchange");
-                    }
-                }
+        while let Some(result) = in_flight.next().await {
+            let Ok(received_items) = result else {
+                continue;
+            };
+            received_count += received_items.len();
+
+            let collector = collector_lock.read().await;
+            for item in &received_items {
+                Self::process_single_item(collector.get_all_metrics(), &mut delta, item);
             }
         }
 
         info!(
-            local_items = local_ranked.len(),
+            payload_bytes = exchange_data.len(),
             neighbors = neighbor_nodes.len(),
             received_items = received_count,
             "Exchanged popularity data"
         );
 
-        updated_metrics
+        delta
     }
 
     /// Function for render one item
+    ///
+    /// Local metrics are not copied, changed or new ones go to `delta`
     fn process_single_item(
-        &self,
-        metrics_map: &mut HashMap<Vec<u8>, PopularityMetrics>,
-        data: Value,
-    ) -> Result<(), Box<dyn std::error::Error>> {
-        let key_hex = data["key"].as_str().ok_or("Missing key")?;
-        let key = hex::decode(key_hex)?;
-        let received_metrics_val = data.get("metrics").cloned().unwrap_or(Value::Null);
-
-        if let Some(existing_metrics) = metrics_map.get_mut(&key) {
-            let received_replication = received_metrics_val["replication_count"]
-                .as_u64()
-                .unwrap_or(1) as u32;
-            existing_metrics.update_replication(received_replication);
+        local_metrics: &HashMap<Vec<u8>, PopularityMetrics>,
+        delta: &mut HashMap<Vec<u8>, PopularityMetrics>,
+        item: &PopularityItem,
+    ) {
+        let received_replication = item.metrics.replication_count;
+
+        if let Some(changed) = delta.get_mut(&item.key) {
+            changed.update_replication(received_replication);
+        } else if let Some(existing) = local_metrics.get(&item.key) {
+            if received_replication > existing.replication_count {
+                let mut changed = existing.clone();
+                changed.update_replication(received_replication);
+                delta.insert(item.key.clone(), changed);
+            }
         } else {
-            let new_metrics = PopularityMetrics::from_dict(received_metrics_val)?;
-            metrics_map.insert(key, new_metrics);
+            delta.insert(item.key.clone(), item.metrics.clone());
         }
-        Ok(())
     }
 
     /// Press received items
-    pub async fn process_received_items(&self, items: Vec<Value>) {
+    pub async fn process_received_items(&self, items: Vec<PopularityItem>) {
         let collector_lock = match &self.metrics_collector {
             Some(c) => c,
             None => return,
         };
 
         let mut collector = collector_lock.write().await;
-        for item_data in items {
-            if let Some(key_hex) = item_data["key"].as_str()
-                && let Ok(key) = hex::decode(key_hex)
-                && let Some(metrics) = collector.metrics.get_mut(&key)
-            {
-                let rep = item_data["metrics"]["replication_count"]
-                    .as_u64()
-                    .unwrap_or(1) as u32;
-                metrics.update_replication(rep);
-            }
+        for item in items {
+            collector.update_replication(&item.key, item.metrics.replication_count);
         }
+        drop(collector);
+
+        *self.exchange_payload.write().await = None;
     }
 
     /// Aggregate Global Ranking
@@ -173,13 +213,8 @@ impl PopularityExchanger {
         let results = futures::future::join_all(tasks).await;
 
         for received_ranking in results.into_iter().flatten() {
-            for item_val in received_ranking {
-                if let (Some(key_hex), Some(score)) =
-                    (item_val["key"].as_str(), item_val["score"].as_f64())
-                    && let Ok(key) = hex::decode(key_hex)
-                {
-                    all_scores.entry(key).or_default().push(score);
-                }
+            for item in received_ranking {
+                all_scores.entry(item.key).or_default().push(item.score);
             }
         }
 
@@ -195,20 +230,34 @@ impl PopularityExchanger {
                 continue;
             }
 
-            scores.sort_by(|a, b| a.total_cmp(b));
-            let median_score = scores[scores.len() / 2];
+            // Only the middle element is needed, partial selection is O(n) instead of sort
+            let mid = scores.len() / 2;
+            let (_, &mut median_score, _) =
+                scores.select_nth_unstable_by(mid, |a, b| a.total_cmp(b));
 
-            if let Some(metrics) = collector.get_metrics(&key) {
-                consensus_ranking.push(RankedItem {
-                    key,
-                    score: median_score,
-                    metrics: metrics.clone(),
-                });
+            if collector.get_metrics(&key).is_some() {
+                consensus_ranking.push((median_score, key));
             }
         }
 
-        consensus_ranking.sort_by(|a, b| b.score.total_cmp(&a.score));
-        consensus_ranking.truncate(100);
+        // Select top in O(n) first, so only the kept part is sorted and its metrics cloned
+        if consensus_ranking.len() > GLOBAL_TOP {
+            consensus_ranking.select_nth_unstable_by(GLOBAL_TOP - 1, |a, b| b.0.total_cmp(&a.0));
+            consensus_ranking.truncate(GLOBAL_TOP);
+        }
+        consensus_ranking.sort_by(|a, b| b.0.total_cmp(&a.0));
+
+        let consensus_ranking: Vec<RankedItem> = consensus_ranking
+            .into_iter()
+            .filter_map(|(score, key)| {
+                let metrics = collector.get_metrics(&key)?.clone();
+                Some(RankedItem {
+                    key,
+                    score,
+                    metrics,
+                })
+            })
+            .collect();
 
         let final_top = consensus_ranking.clone();
 
@@ -225,6 +274,12 @@ impl PopularityExchanger {
         final_top
     }
 
+    /// Global ranking for `MSG_GLOBAL_RANKING_RESPONSE`
+    pub async fn get_global_ranking_items(&self) -> Vec<PopularityItem> {
+        let ranking = self.global_ranking.read().await;
+        ranking.iter().map(PopularityItem::from).collect()
+    }
+
     /// Get global ranking in API format
     pub async fn get_global_ranking_api(&self) -> Vec<Value> {
         let ranking = self.global_ranking.read().await;
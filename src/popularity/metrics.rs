@@ -1,11 +1,23 @@
+use crate::logger::KeyHex;
+use crate::popularity::ranking::{PopularityRanker, RankedItem};
+use crate::utils::serialization::bin;
 use crate::utils::time::get_now_f64;
 use serde::{Deserialize, Serialize};
 use std::collections::{HashMap, HashSet, VecDeque};
+use std::sync::Mutex;
+use std::time::{Duration, Instant};
 use tracing::{debug, info};
 
+/// How long a ranked top is reused while metrics don't change
+///
+/// Scores also depend on the age of items, so the top is recounted at least this often
+const TOP_CACHE_TTL: Duration = Duration::from_secs(60);
+
 /// Collect metrics by check all manipulations with data
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct PopularityMetrics {
+    /// Raw key, msgpack bin on the wire instead of an array of integers
+    #[serde(with = "bin")]
     pub key: Vec<u8>,
 
     /// Count of requests
@@ -127,8 +139,18 @@ impl PopularityMetrics {
     }
 }
 
+/// Ranked top, its limit and time when it was counted
+struct TopCache {
+    limit: usize,
+    ranked: Vec<RankedItem>,
+    built_at: Instant,
+}
+
 pub struct MetricsCollector {
+    /// Change it through methods, they drop the ranked top
     pub metrics: HashMap<Vec<u8>, PopularityMetrics>,
+    /// Last ranked top, dropped on every change of metrics
+    top: Mutex<Option<TopCache>>,
 }
 
 impl Default for MetricsCollector {
@@ -141,7 +163,65 @@ impl MetricsCollector {
     pub fn new() -> Self {
         Self {
             metrics: HashMap::new(),
+            top: Mutex::new(None),
+        }
+    }
+
+    /// Top `limit` items by score
+    ///
+    /// Update loop, exchange and API ask for the same top between metric changes,
+    /// so it is ranked once and shared while metrics stay the same
+    pub fn get_top(&self, ranker: &PopularityRanker, limit: usize) -> Vec<RankedItem> {
+        let mut top = self.top.lock().unwrap_or_else(|e| e.into_inner());
+
+        if let Some(cache) = top.as_ref()
+            && cache.built_at.elapsed() < TOP_CACHE_TTL
+            // Shorter list than its limit holds all items, so it fits any limit
+            && (limit <= cache.limit || cache.ranked.len() < cache.limit)
+        {
+            return cache.ranked.iter().take(limit).cloned().collect();
+        }
+
+        let ranked = ranker.rank_items(&self.metrics, Some(limit));
+        *top = Some(TopCache {
+            limit,
+            ranked: ranked.clone(),
+            built_at: Instant::now(),
+        });
+        ranked
+    }
+
+    /// Drop ranked top after change of metrics
+    fn invalidate_top(&mut self) {
+        *self.top.get_mut().unwrap_or_else(|e| e.into_inner()) = None;
+    }
+
+    /// Raise replication count of known item
+    pub fn update_replication(&mut self, key: &[u8], count: u32) {
+        if let Some(m) = self.metrics.get_mut(key) {
+            m.update_replication(count);
+            self.invalidate_top();
+        }
+    }
+
+    /// Merge metrics received from other nodes
+    ///
+    /// Known items only raise replication count, so local requests counted since
+    /// the delta was built are kept. Unknown items are added as they came
+    pub fn merge(&mut self, delta: HashMap<Vec<u8>, PopularityMetrics>) {
+        if delta.is_empty() {
+            return;
         }
+
+        for (key, received) in delta {
+            match self.metrics.get_mut(&key) {
+                Some(m) => m.update_replication(received.replication_count),
+                None => {
+                    self.metrics.insert(key, received);
+                }
+            }
+        }
+        self.invalidate_top();
     }
 
     pub fn record_find_value(&mut self, key: Vec<u8>, node_id: Option<Vec<u8>>) {
@@ -151,11 +231,9 @@ impl MetricsCollector {
             .or_insert_with(|| PopularityMetrics::new(key.clone()));
         m.update_request(node_id);
         m.update_freshness(None);
+        self.invalidate_top();
 
-        debug!(
-            "Recorded FIND_VALUE for key: {}",
-            hex::encode(&key[..key.len().min(8)])
-        );
+        debug!("Recorded FIND_VALUE for key: {}", KeyHex(&key));
     }
 
     pub fn record_store(&mut self, key: Vec<u8>, replication_count: u32) {
@@ -165,10 +243,11 @@ impl MetricsCollector {
             .or_insert_with(|| PopularityMetrics::new(key.clone()));
         m.update_replication(replication_count);
         m.update_freshness(None);
+        self.invalidate_top();
 
         debug!(
             "Recorded STORE for key: {}, replication: {}",
-            hex::encode(&key[..key.len().min(8)]),
+            KeyHex(&key),
             replication_count
         );
     }
@@ -179,10 +258,11 @@ impl MetricsCollector {
             .entry(key.clone())
             .or_insert_with(|| PopularityMetrics::new(key.clone()));
         m.update_social_engagement(count);
+        self.invalidate_top();
 
         debug!(
             "Recorded social engagement for key: {}, count: {}",
-            hex::encode(&key[..key.len().min(8)]),
+            KeyHex(&key),
             count
         );
     }
@@ -199,6 +279,7 @@ impl MetricsCollector {
         for m in self.metrics.values_mut() {
             m.update_freshness(None);
         }
+        self.invalidate_top();
     }
 
     pub fn cleanup_old_metrics(&mut self, max_age_days: u64) {
@@ -211,6 +292,7 @@ impl MetricsCollector {
 
         let removed = initial_len - self.metrics.len();
         if removed > 0 {
+            self.invalidate_top();
             info!("Cleaned up old metrics, removed count: {}", removed);
         }
     }
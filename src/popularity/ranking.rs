@@ -26,6 +26,13 @@ impl PopularityRanker {
 
     /// Calculate ranking of popularity
     pub fn calculate_score(&self, metrics: &PopularityMetrics, adaptive_weights: bool) -> f64 {
+        self.score_at(metrics, adaptive_weights, get_now_f64())
+    }
+
+    /// Calculate ranking of popularity at moment `now`
+    ///
+    /// Ranking of many items reads the clock once and passes it here
+    fn score_at(&self, metrics: &PopularityMetrics, adaptive_weights: bool, now: f64) -> f64 {
         let w_request_rate = 0.25;
         let w_replication_factor = 0.20;
         let mut w_freshness = 0.15;
@@ -34,7 +41,7 @@ impl PopularityRanker {
         let mut w_seed_coverage = 0.10;
 
         if adaptive_weights {
-            let age_seconds = get_now_f64() - metrics.first_seen;
+            let age_seconds = now - metrics.first_seen;
 
             if age_seconds < 86400.0 {
                 w_freshness = 0.30;
@@ -77,30 +84,15 @@ impl PopularityRanker {
     }
 
     /// Rank items
+    ///
+    /// With `limit` only the top part is selected in O(n) and sorted,
+    /// metrics are cloned only for returned items
     pub fn rank_items(
         &self,
         metrics_dict: &HashMap<Vec<u8>, PopularityMetrics>,
         limit: Option<usize>,
     ) -> Vec<RankedItem> {
-        let mut ranked_items: Vec<RankedItem> = metrics_dict
-            .iter()
-            .map(|(key, metrics)| {
-                let score = self.calculate_score(metrics, true);
-                RankedItem {
-                    key: key.clone(),
-                    score,
-                    metrics: metrics.clone(),
-                }
-            })
-            .collect();
-
-        ranked_items.sort_by(|a, b| b.score.total_cmp(&a.score));
-
-        if let Some(l) = limit {
-            ranked_items.truncate(l);
-        }
-
-        ranked_items
+        self.top_ranked(metrics_dict, None, limit)
     }
 
     /// Get popular items
@@ -109,14 +101,7 @@ impl PopularityRanker {
         metrics_dict: &HashMap<Vec<u8>, PopularityMetrics>,
         limit: usize,
     ) -> Vec<RankedItem> {
-        let ranked = self.rank_items(metrics_dict, None);
-        let mut popular: Vec<RankedItem> = ranked
-            .into_iter()
-            .filter(|item| item.score >= self.popularity_threshold)
-            .collect();
-
-        popular.truncate(limit);
-        popular
+        self.top_ranked(metrics_dict, Some(self.popularity_threshold), Some(limit))
     }
 
     /// Get active items
@@ -125,14 +110,43 @@ impl PopularityRanker {
         metrics_dict: &HashMap<Vec<u8>, PopularityMetrics>,
         limit: usize,
     ) -> Vec<RankedItem> {
-        let ranked = self.rank_items(metrics_dict, None);
-        let mut active: Vec<RankedItem> = ranked
-            .into_iter()
-            .filter(|item| item.score >= self.active_threshold)
+        self.top_ranked(metrics_dict, Some(self.active_threshold), Some(limit))
+    }
+
+    /// Top items by score which are not lower than `min_score`
+    fn top_ranked(
+        &self,
+        metrics_dict: &HashMap<Vec<u8>, PopularityMetrics>,
+        min_score: Option<f64>,
+        limit: Option<usize>,
+    ) -> Vec<RankedItem> {
+        let now = get_now_f64();
+        let mut scored: Vec<(f64, &Vec<u8>, &PopularityMetrics)> = metrics_dict
+            .iter()
+            .map(|(key, metrics)| (self.score_at(metrics, true, now), key, metrics))
+            .filter(|(score, _, _)| min_score.is_none_or(|min| *score >= min))
             .collect();
 
-        active.truncate(limit);
-        active
+        if let Some(l) = limit
+            && l < scored.len()
+        {
+            if l == 0 {
+                return Vec::new();
+            }
+            scored.select_nth_unstable_by(l - 1, |a, b| b.0.total_cmp(&a.0));
+            scored.truncate(l);
+        }
+
+        scored.sort_by(|a, b| b.0.total_cmp(&a.0));
+
+        scored
+            .into_iter()
+            .map(|(score, key, metrics)| RankedItem {
+                key: key.clone(),
+                score,
+                metrics: metrics.clone(),
+            })
+            .collect()
     }
 }
 
@@ -3,6 +3,7 @@ use std::sync::Arc;
 use tracing::{debug, error, info, warn};
 
 use crate::dht::protocol::DHTProtocol;
+use crate::logger::KeyHex;
 use crate::popularity::ranking::RankedItem;
 use crate::storage::main::Storage;
 
@@ -56,7 +57,7 @@ impl Replicator {
 
         for item in popular_items {
             let key = &item.key;
-            let key_hex = hex::encode(&key[..key.len().min(8)]);
+            let key_hex = KeyHex(key);
 
             let value_result = self.storage.get(key.clone()).await;
 
@@ -125,8 +126,6 @@ impl Replicator {
         let mut results = HashMap::new();
 
         for key in keys {
-            let _key_hex = hex::encode(&key[..key.len().min(8)]);
-
             match self.storage.get(key.clone()).await {
                 Ok(Some(value)) => {
                     match self.dht_protocol.store(&key, &value, 86400).await {
@@ -147,7 +146,7 @@ impl Replicator {
     ///
     /// If node leave us bad data should be sent for do not die
     pub async fn emergency_replication(&self, key: Vec<u8>, value: Vec<u8>) -> bool {
-        let key_hex = hex::encode(&key[..key.len().min(8)]);
+        let key_hex = KeyHex(&key);
         warn!(key = %key_hex, "Emergency replication triggered");
 
         let ttl = 2592000;
@@ -1,12 +1,63 @@
-use std::collections::{HashMap, VecDeque};
+use std::collections::HashMap;
+use std::time::{Duration, Instant};
 use tracing::warn;
 
 use crate::exceptions::{NetworkError, RhizomeError};
-use crate::utils::time::get_now_f64;
+use crate::logger::KeyHex;
+
+/// Number of buckets the sliding window is split into
+const BUCKETS: usize = 10;
+
+/// Request counters of the window split into fixed time buckets
+///
+/// Memory does not depend on the request rate, check is O(1)
+struct BucketWindow {
+    /// Ring of counters, bucket of period `p` is `p % BUCKETS`
+    counts: [u32; BUCKETS],
+    /// Sum of `counts`
+    total: u32,
+    /// Period of the newest bucket
+    head: u64,
+}
+
+impl BucketWindow {
+    fn new(period: u64) -> Self {
+        Self {
+            counts: [0; BUCKETS],
+            total: 0,
+            head: period,
+        }
+    }
+
+    /// Move the ring to `period`, buckets which left the window are zeroed
+    fn advance(&mut self, period: u64) {
+        if period <= self.head {
+            return;
+        }
+
+        if period - self.head >= BUCKETS as u64 {
+            self.counts = [0; BUCKETS];
+            self.total = 0;
+        } else {
+            for p in self.head + 1..=period {
+                let count = &mut self.counts[(p % BUCKETS as u64) as usize];
+                self.total -= *count;
+                *count = 0;
+            }
+        }
+        self.head = period;
+    }
+
+    fn add(&mut self) {
+        self.counts[(self.head % BUCKETS as u64) as usize] += 1;
+        self.total += 1;
+    }
+}
 
 /// Structure for limit messages peer some period of time
 ///
-/// Use algo of Sliding Window
+/// Use algo of Sliding Window over time buckets: window of `window_seconds` is kept
+/// as `BUCKETS` counters, so the oldest requests leave it by whole buckets
 pub struct RateLimiter {
     /// Global limit of requests
     max_requests: usize,
@@ -15,21 +66,31 @@ pub struct RateLimiter {
     /// Limit for one node
     per_node_limit: usize,
 
-    /// History of all requests (timestamps)
-    request_history: VecDeque<f64>,
+    /// Start of the periods count
+    started: Instant,
+    /// Time of one bucket
+    bucket_len: Duration,
 
-    /// Requests by node: NodeID -> deque of timestamps
-    node_requests: HashMap<Vec<u8>, VecDeque<f64>>,
+    /// Counters of all requests
+    requests: BucketWindow,
+
+    /// Requests by node: NodeID -> counters
+    node_requests: HashMap<Vec<u8>, BucketWindow>,
 }
 
 impl RateLimiter {
     /// Initialize rate limiter
     pub fn new(max_requests: usize, window_seconds: u64, per_node_limit: usize) -> Self {
+        let bucket_len =
+            (Duration::from_secs(window_seconds) / BUCKETS as u32).max(Duration::from_millis(1));
+
         Self {
             max_requests,
             window_seconds,
             per_node_limit,
-            request_history: VecDeque::with_capacity(max_requests * 2),
+            started: Instant::now(),
+            bucket_len,
+            requests: BucketWindow::new(0),
             node_requests: HashMap::new(),
         }
     }
@@ -38,11 +99,9 @@ impl RateLimiter {
     ///
     /// Main function which work with all requests and can block some requests if they do not fit
     pub fn check_rate_limit(&mut self, node_id: Option<&[u8]>) -> Result<bool, RhizomeError> {
-        let current_time = get_now_f64();
-
-        self.cleanup_old_requests(current_time);
+        let period = self.advance();
 
-        let recent_requests = self.request_history.len();
+        let recent_requests = self.requests.total as usize;
 
         if recent_requests >= self.max_requests {
             warn!(
@@ -54,18 +113,20 @@ impl RateLimiter {
         }
 
         if let Some(id) = node_id {
-            let node_id_vec = id.to_vec();
-            let node_history = self
+            if !self.node_requests.contains_key(id) {
+                self.node_requests
+                    .insert(id.to_vec(), BucketWindow::new(period));
+            }
+            let node_window = self
                 .node_requests
-                .entry(node_id_vec.clone())
-                .or_insert_with(|| VecDeque::with_capacity(self.per_node_limit * 2));
+                .get_mut(id)
+                .expect("window inserted above");
 
-            let node_recent = node_history.len();
+            let node_recent = node_window.total as usize;
 
             if node_recent >= self.per_node_limit {
-                let hex_id = hex::encode(&id[..id.len().min(8)]);
                 warn!(
-                    node_id = %hex_id,
+                    node_id = %KeyHex(id),
                     requests = node_recent,
                     limit = self.per_node_limit,
                     "Per-node rate limit exceeded"
@@ -73,49 +134,37 @@ impl RateLimiter {
                 return Err(RhizomeError::Network(NetworkError::RateLimitError));
             }
 
-            node_history.push_back(current_time);
+            node_window.add();
         }
 
-        self.request_history.push_back(current_time);
+        self.requests.add();
 
         Ok(true)
     }
 
-    /// Cleanup old requests by window size in sliding window
-    fn cleanup_old_requests(&mut self, current_time: f64) {
-        let window = self.window_seconds as f64;
-
-        while let Some(&first_ts) = self.request_history.front() {
-            if current_time - first_ts > window {
-                self.request_history.pop_front();
-            } else {
-                break;
-            }
+    /// Move windows to the current period and return it
+    ///
+    /// Nodes without requests in the window are removed once per bucket, not per check
+    fn advance(&mut self) -> u64 {
+        let period = (self.started.elapsed().as_nanos() / self.bucket_len.as_nanos()) as u64;
+
+        if period > self.requests.head {
+            self.requests.advance(period);
+            self.node_requests.retain(|_, window| {
+                window.advance(period);
+                window.total > 0
+            });
         }
 
-        self.node_requests.retain(|_, history| {
-            while let Some(&first_ts) = history.front() {
-                if current_time - first_ts > window {
-                    history.pop_front();
-                } else {
-                    break;
-                }
-            }
-
-            !history.is_empty()
-        });
+        period
     }
 
     /// Getting requests statistics for analyze
     pub fn get_stats(&mut self) -> HashMap<String, f64> {
-        let current_time = get_now_f64();
-        self.cleanup_old_requests(current_time);
+        self.advance();
 
         let mut stats = HashMap::new();
-        stats.insert(
-            "recent_requests".to_string(),
-            self.request_history.len() as f64,
-        );
+        stats.insert("recent_requests".to_string(), self.requests.total as f64);
         stats.insert("max_requests".to_string(), self.max_requests as f64);
         stats.insert("window_seconds".to_string(), self.window_seconds as f64);
         stats.insert("active_nodes".to_string(), self.node_requests.len() as f64);
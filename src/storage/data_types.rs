@@ -1,3 +1,4 @@
+use crate::utils::serialization::{SerializationError, from_msgpack, to_msgpack};
 use crate::utils::time::get_now_i64;
 use serde::{Deserialize, Serialize};
 use serde_json::{self, Map, Value};
@@ -76,6 +77,20 @@ impl ThreadMetadata {
         }
         Ok(meta)
     }
+
+    /// Encode Thread metadata in msgpack without JSON value in the middle
+    pub fn to_bytes(&self) -> Result<Vec<u8>, SerializationError> {
+        to_msgpack(self)
+    }
+
+    /// Decode Thread metadata from msgpack bytes
+    pub fn from_bytes(data: &[u8]) -> Result<Self, SerializationError> {
+        let mut meta: Self = from_msgpack(data)?;
+        if meta.last_activity == 0 {
+            meta.last_activity = meta.created_at;
+        }
+        Ok(meta)
+    }
 }
 
 /// Describe Message in Thread
@@ -145,6 +160,20 @@ impl Message {
         }
         Ok(msg)
     }
+
+    /// Encode Message in msgpack without JSON value in the middle
+    pub fn to_bytes(&self) -> Result<Vec<u8>, SerializationError> {
+        to_msgpack(self)
+    }
+
+    /// Decode Message from msgpack bytes
+    pub fn from_bytes(data: &[u8]) -> Result<Self, SerializationError> {
+        let mut msg: Self = from_msgpack(data)?;
+        if msg.timestamp == 0 {
+            msg.timestamp = get_now_i64();
+        }
+        Ok(msg)
+    }
 }
 
 /// Container for thread data
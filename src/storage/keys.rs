@@ -1,5 +1,14 @@
+use std::collections::HashMap;
+use std::sync::{LazyLock, Mutex};
+
 use crate::utils::crypto::hash_key;
 
+// Global keys do not depend on any id, so each is hashed once per process
+static GLOBAL_THREADS_KEY: LazyLock<[u8; 32]> = LazyLock::new(|| hash_key(b"global:threads"));
+static GLOBAL_POPULAR_KEY: LazyLock<[u8; 32]> = LazyLock::new(|| hash_key(b"global:popular"));
+static GLOBAL_RECENT_KEY: LazyLock<[u8; 32]> = LazyLock::new(|| hash_key(b"global:recent"));
+static GLOBAL_SEEDS_KEY: LazyLock<[u8; 32]> = LazyLock::new(|| hash_key(b"global:seeds"));
+
 /// DHT key builder
 pub struct DHTKeyBuilder;
 
@@ -7,22 +16,22 @@ pub struct DHTKeyBuilder;
 impl DHTKeyBuilder {
     /// Key for list of all threads
     pub fn global_threads() -> [u8; 32] {
-        hash_key("global:threads".as_bytes())
+        *GLOBAL_THREADS_KEY
     }
 
     /// Key for N-top popular themes
     pub fn global_popular() -> [u8; 32] {
-        hash_key("global:popular".as_bytes())
+        *GLOBAL_POPULAR_KEY
     }
 
     /// Key for last N messages
     pub fn global_recent() -> [u8; 32] {
-        hash_key("global:recent".as_bytes())
+        *GLOBAL_RECENT_KEY
     }
 
     /// Key for list active seed-nodes
     pub fn global_seeds() -> [u8; 32] {
-        hash_key("global:seeds".as_bytes())
+        *GLOBAL_SEEDS_KEY
     }
 
     /// Key for thread metadata
@@ -50,6 +59,21 @@ impl DHTKeyBuilder {
         hash_key(format!("msg:{}", message_hash).as_bytes())
     }
 
+    /// Key for message by raw bytes of message hash
+    ///
+    /// Gives the same key as `message(&hex::encode(prefix))`, but hex is written
+    /// in stack buffer. Prefix longer than 32 bytes is cut
+    pub fn message_from_prefix(prefix: &[u8]) -> [u8; 32] {
+        let prefix = &prefix[..prefix.len().min(32)];
+        let hex_len = prefix.len() * 2;
+
+        let mut buf = [0u8; 4 + 64];
+        buf[..4].copy_from_slice(b"msg:");
+        hex::encode_to_slice(prefix, &mut buf[4..4 + hex_len]).expect("hex buffer has exact size");
+
+        hash_key(&buf[..4 + hex_len])
+    }
+
     /// Key for links ot the reply on message
     pub fn message_refs(message_hash: &str) -> [u8; 32] {
         hash_key(format!("msg:{}:refs", message_hash).as_bytes())
@@ -81,12 +105,20 @@ impl DHTKeyBuilder {
     }
 }
 
+/// Max count of memoized keys for one kind of key
+const KEY_CACHE_SIZE: usize = 8192;
+
 /// Manager for work with keys
 ///
-/// It is template for work with builder
+/// It is template for work with builder which memoizes derived keys,
+/// so repeated lookups of the same thread or message do not hash again
 pub struct KeyManager {
-    // In Rust, we don't need to save builder instance
-    // if methods are static
+    /// Cache: thread_id -> thread metadata key
+    thread_meta_keys: Mutex<HashMap<String, [u8; 32]>>,
+    /// Cache: message_hash -> message key
+    message_keys: Mutex<HashMap<String, [u8; 32]>>,
+    /// Cache: message_id -> message key
+    message_id_keys: Mutex<HashMap<String, [u8; 32]>>,
 }
 
 impl Default for KeyManager {
@@ -97,17 +129,64 @@ impl Default for KeyManager {
 
 impl KeyManager {
     pub fn new() -> Self {
-        Self {}
+        Self {
+            thread_meta_keys: Mutex::new(HashMap::new()),
+            message_keys: Mutex::new(HashMap::new()),
+            message_id_keys: Mutex::new(HashMap::new()),
+        }
+    }
+
+    /// Get key from cache or derive it and remember
+    ///
+    /// Cache is dropped when it grows up to `KEY_CACHE_SIZE`
+    fn cached(
+        cache: &Mutex<HashMap<String, [u8; 32]>>,
+        id: &str,
+        derive: fn(&str) -> [u8; 32],
+    ) -> [u8; 32] {
+        let mut cache = cache.lock().unwrap_or_else(|e| e.into_inner());
+        if let Some(key) = cache.get(id) {
+            return *key;
+        }
+
+        if cache.len() >= KEY_CACHE_SIZE {
+            cache.clear();
+        }
+
+        let key = derive(id);
+        cache.insert(id.to_string(), key);
+        key
     }
 
     /// Get key for thread metadata
     pub fn get_thread_meta_key(&self, thread_id: &str) -> [u8; 32] {
-        DHTKeyBuilder::thread_meta(thread_id)
+        Self::cached(
+            &self.thread_meta_keys,
+            thread_id,
+            DHTKeyBuilder::thread_meta,
+        )
     }
 
     /// Get Key for message
     pub fn get_message_key(&self, message_hash: &str) -> [u8; 32] {
-        DHTKeyBuilder::message(message_hash)
+        Self::cached(&self.message_keys, message_hash, DHTKeyBuilder::message)
+    }
+
+    /// Get key for message by raw bytes of message hash
+    ///
+    /// Skips hex string round-trip of `get_message_key`
+    pub fn get_message_key_bytes(&self, message_hash: &[u8]) -> [u8; 32] {
+        DHTKeyBuilder::message_from_prefix(message_hash)
+    }
+
+    /// Get key for message by its id
+    ///
+    /// Same as `get_message_key_bytes(&hash_key(message_id)[..8])`, but both
+    /// hashes are done only on the first lookup of the id
+    pub fn get_message_key_by_id(&self, message_id: &str) -> [u8; 32] {
+        Self::cached(&self.message_id_keys, message_id, |id| {
+            DHTKeyBuilder::message_from_prefix(&hash_key(id.as_bytes())[..8])
+        })
     }
 
     /// Get key for global list of threads
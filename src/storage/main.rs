@@ -1,12 +1,11 @@
 use std::fs;
-use std::path::PathBuf;
 
 use crate::config::StorageConfig;
 use crate::exceptions::StorageError;
-use crate::utils::serialization::{deserialize, serialize};
+use crate::utils::serialization::{from_msgpack, to_msgpack};
 use crate::utils::time::get_now_f64;
 use heed::types::Bytes;
-use heed::{Database, Env, EnvOpenOptions};
+use heed::{Database, Env, EnvOpenOptions, RwTxn};
 use serde::{Deserialize, Serialize};
 use tokio::task;
 
@@ -30,8 +29,8 @@ pub struct Storage {
 
 impl Storage {
     pub fn new(config: StorageConfig) -> Result<Self, Box<dyn std::error::Error>> {
-        let data_dir = PathBuf::from(&config.data_dir);
-        fs::create_dir_all(&data_dir)?;
+        let data_dir = config.data_dir.as_path();
+        fs::create_dir_all(data_dir)?;
 
         let db_path = data_dir.join("data.lmdb");
         if !db_path.exists() {
@@ -72,7 +71,7 @@ impl Storage {
             size: value.len(),
         };
 
-        let meta_bytes = serialize(&meta, "msgpack").map_err(|_| StorageError::General)?;
+        let meta_bytes = to_msgpack(&meta).map_err(|_| StorageError::General)?;
 
         let env = self.env.clone();
         let db = self.db;
@@ -92,6 +91,13 @@ impl Storage {
 
     /// Reading storage and checking TTL
     pub async fn get(&self, key: Vec<u8>) -> Result<Option<Vec<u8>>, StorageError> {
+        Ok(self.get_with_ttl(key).await?.map(|(value, _)| value))
+    }
+
+    /// Value with seconds left until its expiration
+    ///
+    /// Value without metadata has no expiration, `f64::INFINITY` is returned for it
+    pub async fn get_with_ttl(&self, key: Vec<u8>) -> Result<Option<(Vec<u8>, f64)>, StorageError> {
         let env = self.env.clone();
         let db = self.db;
         let meta_db = self.meta_db;
@@ -102,14 +108,19 @@ impl Storage {
         let result = task::spawn_blocking(move || {
             let txn = env.read_txn().unwrap();
 
+            let mut ttl_left = f64::INFINITY;
             if let Some(meta_bytes) = meta_db.get(&txn, &key_clone).unwrap() {
-                let meta: MetaData = deserialize(meta_bytes, "msgpack").unwrap();
+                let meta: MetaData = from_msgpack(meta_bytes).unwrap();
                 if current_time > meta.expires_at {
                     return Ok(None);
                 }
+                ttl_left = meta.expires_at - current_time;
             }
 
-            let value = db.get(&txn, &key_clone).unwrap().map(|b| b.to_vec());
+            let value = db
+                .get(&txn, &key_clone)
+                .unwrap()
+                .map(|b| (b.to_vec(), ttl_left));
             Ok(value)
         })
         .await
@@ -148,16 +159,8 @@ impl Storage {
 
         task::spawn_blocking(move || {
             let mut txn = env.write_txn().unwrap();
-            let meta_data = meta_db.get(&txn, &key).unwrap();
 
-            if let Some(bytes) = meta_data {
-                let mut meta: MetaData = deserialize(bytes, "msgpack").unwrap();
-                let current_ttl = meta.expires_at - current_time;
-                let new_ttl = current_ttl * (1.0 + extension);
-                meta.expires_at = current_time + new_ttl;
-
-                let new_meta_bytes = serialize(&meta, "msgpack").unwrap();
-                meta_db.put(&mut txn, &key, &new_meta_bytes).unwrap();
+            if Self::extend_meta(meta_db, &mut txn, &key, extension, current_time) {
                 txn.commit().unwrap();
                 Ok(true)
             } else {
@@ -168,6 +171,59 @@ impl Storage {
         .map_err(|_| StorageError::General)?
     }
 
+    /// Set more time to life for many keys in one write transaction
+    ///
+    /// Returns count of extended keys, missing ones are skipped
+    pub async fn extend_ttl_bulk(&self, items: Vec<(Vec<u8>, f64)>) -> Result<usize, StorageError> {
+        if items.is_empty() {
+            return Ok(0);
+        }
+
+        let env = self.env.clone();
+        let meta_db = self.meta_db;
+        let current_time = get_now_f64();
+
+        task::spawn_blocking(move || {
+            let mut txn = env.write_txn().unwrap();
+
+            let mut extended = 0;
+            for (key, extension) in &items {
+                if Self::extend_meta(meta_db, &mut txn, key, *extension, current_time) {
+                    extended += 1;
+                }
+            }
+
+            if extended > 0 {
+                txn.commit().unwrap();
+            }
+            Ok(extended)
+        })
+        .await
+        .map_err(|_| StorageError::General)?
+    }
+
+    /// Stretch left TTL of the key by `extension` part inside open transaction
+    fn extend_meta(
+        meta_db: Database<Bytes, Bytes>,
+        txn: &mut RwTxn,
+        key: &[u8],
+        extension: f64,
+        current_time: f64,
+    ) -> bool {
+        let Some(bytes) = meta_db.get(txn, key).unwrap() else {
+            return false;
+        };
+
+        let mut meta: MetaData = from_msgpack(bytes).unwrap();
+        let current_ttl = meta.expires_at - current_time;
+        let new_ttl = current_ttl * (1.0 + extension);
+        meta.expires_at = current_time + new_ttl;
+
+        let new_meta_bytes = to_msgpack(&meta).unwrap();
+        meta_db.put(txn, key, &new_meta_bytes).unwrap();
+        true
+    }
+
     /// For long support to check space
     fn has_space(&self, _size: usize) -> bool {
         true
@@ -190,7 +246,7 @@ impl Storage {
                 let iter = meta_db.iter(&txn).unwrap();
                 for item in iter {
                     let (key_bytes, meta_bytes) = item.unwrap();
-                    let meta: MetaData = deserialize(meta_bytes, "msgpack").unwrap();
+                    let meta: MetaData = from_msgpack(meta_bytes).unwrap();
                     if current_time > meta.expires_at {
                         to_delete.push(key_bytes.to_vec());
                     }
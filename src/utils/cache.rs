@@ -0,0 +1,104 @@
+use std::collections::{BTreeMap, HashMap};
+use std::hash::Hash;
+use std::time::{Duration, Instant};
+
+/// Entry of the cache with its expiration and recency stamp
+struct CacheEntry<V> {
+    value: V,
+    expires_at: Instant,
+    tick: u64,
+}
+
+/// Bounded LRU cache where every entry lives at most `ttl`
+///
+/// Recency order is kept in a `BTreeMap` by a monotonic counter,
+/// so the oldest entry is evicted in O(log n)
+pub struct TtlCache<K, V> {
+    capacity: usize,
+    ttl: Duration,
+    entries: HashMap<K, CacheEntry<V>>,
+    /// Recency stamp -> key, first item is the least recently used
+    order: BTreeMap<u64, K>,
+    next_tick: u64,
+}
+
+impl<K: Hash + Eq + Clone, V> TtlCache<K, V> {
+    pub fn new(capacity: usize, ttl: Duration) -> Self {
+        Self {
+            capacity,
+            ttl,
+            entries: HashMap::with_capacity(capacity),
+            order: BTreeMap::new(),
+            next_tick: 0,
+        }
+    }
+
+    /// Get live value and mark it as recently used
+    pub fn get(&mut self, key: &K) -> Option<&V> {
+        self.get_mut(key).map(|value| &*value)
+    }
+
+    /// Get live value for change and mark it as recently used
+    pub fn get_mut(&mut self, key: &K) -> Option<&mut V> {
+        let now = Instant::now();
+        let expired = self.entries.get(key)?.expires_at <= now;
+        if expired {
+            self.remove(key);
+            return None;
+        }
+
+        let tick = self.bump();
+        let entry = self.entries.get_mut(key)?;
+        self.order.remove(&entry.tick);
+        self.order.insert(tick, key.clone());
+        entry.tick = tick;
+        Some(&mut entry.value)
+    }
+
+    /// Insert value with fresh TTL, the least recently used entry leaves on overflow
+    pub fn insert(&mut self, key: K, value: V) {
+        self.insert_with_ttl(key, value, self.ttl);
+    }
+
+    /// Insert value which lives `ttl` instead of the cache default
+    pub fn insert_with_ttl(&mut self, key: K, value: V, ttl: Duration) {
+        self.remove(&key);
+
+        if self.entries.len() >= self.capacity
+            && let Some((_, oldest)) = self.order.pop_first()
+        {
+            self.entries.remove(&oldest);
+        }
+
+        let tick = self.bump();
+        self.order.insert(tick, key.clone());
+        self.entries.insert(
+            key,
+            CacheEntry {
+                value,
+                expires_at: Instant::now() + ttl,
+                tick,
+            },
+        );
+    }
+
+    /// Remove value from the cache
+    pub fn remove(&mut self, key: &K) -> Option<V> {
+        let entry = self.entries.remove(key)?;
+        self.order.remove(&entry.tick);
+        Some(entry.value)
+    }
+
+    pub fn len(&self) -> usize {
+        self.entries.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.entries.is_empty()
+    }
+
+    fn bump(&mut self) -> u64 {
+        self.next_tick += 1;
+        self.next_tick
+    }
+}
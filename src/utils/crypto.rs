@@ -48,16 +48,25 @@ pub fn compute_distance(node_id1: &[u8], node_id2: &[u8]) -> Vec<u8> {
 
 /// Hashing the key for DHT (SHA-256)
 ///
+/// `sha2` picks SHA-NI / ARMv8 SHA extensions at runtime when CPU has them.
+/// Digest is returned as array without intermediate copy
+///
 /// Args:
 /// - key: The key for hashing
 pub fn hash_key(key: &[u8]) -> [u8; 32] {
-    let mut hasher = Sha256::new();
-    hasher.update(key);
-    let result = hasher.finalize();
+    Sha256::digest(key).into()
+}
 
-    let mut hash = [0u8; 32];
-    hash.copy_from_slice(&result);
-    hash
+/// Kademlia id of the DHT key (SHA-1)
+///
+/// Keys with common prefix get uniformly spread ids instead of landing in one bucket
+///
+/// Args:
+/// - key: The key of stored value
+pub fn key_to_node_id(key: &[u8]) -> [u8; 20] {
+    let mut node_id = [0u8; 20];
+    node_id.copy_from_slice(&Sha1::digest(key));
+    node_id
 }
 
 /// Generating a key pair for cryptography
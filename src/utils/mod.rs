@@ -1,3 +1,5 @@
+/// Bounded LRU cache with TTL
+pub mod cache;
 /// Module for work with node_id
 pub mod crypto;
 /// Module for work with serialization
@@ -1,4 +1,7 @@
-use serde::{Serialize, de::DeserializeOwned};
+use std::borrow::Cow;
+use std::io::{self, Read};
+
+use serde::{Deserialize, Serialize, de::DeserializeOwned};
 use thiserror::Error;
 
 #[derive(Error, Debug)]
@@ -14,8 +17,22 @@ pub enum SerializationError {
 
     #[error("Msgpack decode error: {0}")]
     MsgpackDecodeError(#[from] rmp_serde::decode::Error),
+
+    #[error("Zstd error: {0}")]
+    CompressionError(#[from] std::io::Error),
 }
 
+/// First byte of zstd-compressed blob
+///
+/// Msgpack of a list or a map never starts with it, so plain blobs stay readable
+const ZSTD_TAG: u8 = 0x01;
+/// Blobs not larger than this are stored as is
+const COMPRESS_THRESHOLD: usize = 1024;
+/// Fast zstd level, compression stays cheaper than sending extra bytes to replicas
+const ZSTD_LEVEL: i32 = 3;
+/// Upper bound of decompressed blob, data from DHT may be a decompression bomb
+const MAX_DECOMPRESSED_BYTES: u64 = 16 * 1024 * 1024;
+
 /// Data serialization
 ///
 /// Args:
@@ -23,15 +40,8 @@ pub enum SerializationError {
 /// - format: Serialization format ("msgpack" or "json")
 pub fn serialize<T: Serialize>(data: &T, format: &str) -> Result<Vec<u8>, SerializationError> {
     match format {
-        "msgpack" => {
-            let mut buf = Vec::new();
-            data.serialize(&mut rmp_serde::Serializer::new(&mut buf))?;
-            Ok(buf)
-        }
-        "json" => {
-            let json_string = serde_json::to_string(data)?;
-            Ok(json_string.into_bytes())
-        }
+        "msgpack" => to_msgpack(data),
+        "json" => Ok(serde_json::to_vec(data)?),
         _ => Err(SerializationError::UnsupportedFormat(format.to_string())),
     }
 }
@@ -46,10 +56,7 @@ pub fn deserialize<T: DeserializeOwned>(
     format: &str,
 ) -> Result<T, SerializationError> {
     match format {
-        "msgpack" => {
-            let val = rmp_serde::from_slice(data)?;
-            Ok(val)
-        }
+        "msgpack" => from_msgpack(data),
         "json" => {
             let val = serde_json::from_slice(data)?;
             Ok(val)
@@ -57,3 +64,129 @@ pub fn deserialize<T: DeserializeOwned>(
         _ => Err(SerializationError::UnsupportedFormat(format.to_string())),
     }
 }
+
+/// Msgpack serialization without format dispatch
+///
+/// Used on hot paths: DHT payloads and storage metadata are always msgpack
+pub fn to_msgpack<T: Serialize + ?Sized>(data: &T) -> Result<Vec<u8>, SerializationError> {
+    // Most of DHT payloads (metadata, messages, id lists) fit in this size
+    let mut buf = Vec::with_capacity(256);
+    to_msgpack_into(&mut buf, data)?;
+    Ok(buf)
+}
+
+/// Msgpack serialization appended to an existing buffer
+///
+/// Lets callers reuse one buffer with its capacity for many messages
+pub fn to_msgpack_into<T: Serialize + ?Sized>(
+    buf: &mut Vec<u8>,
+    data: &T,
+) -> Result<(), SerializationError> {
+    data.serialize(&mut rmp_serde::Serializer::new(buf))?;
+    Ok(())
+}
+
+/// Msgpack deserialization without format dispatch
+///
+/// Result may borrow from `data`, e.g. `Vec<&str>` reads id list without
+/// allocating a string per id
+pub fn from_msgpack<'a, T: Deserialize<'a>>(data: &'a [u8]) -> Result<T, SerializationError> {
+    Ok(rmp_serde::from_slice(data)?)
+}
+
+/// Serde adapter which writes byte fields as msgpack `bin`
+///
+/// Default serde form of `[u8; N]` and `Vec<u8>` is an array of integers: one
+/// marker per byte on encode and per-element visit on decode. `bin` is a length
+/// and one copy. Reading still accepts integer arrays from older peers.
+///
+/// Usage: `#[serde(with = "crate::utils::serialization::bin")]`
+pub mod bin {
+    use serde::de::{self, SeqAccess, Visitor};
+    use serde::{Deserializer, Serializer};
+    use std::fmt;
+
+    pub fn serialize<T: AsRef<[u8]>, S: Serializer>(
+        bytes: &T,
+        serializer: S,
+    ) -> Result<S::Ok, S::Error> {
+        serializer.serialize_bytes(bytes.as_ref())
+    }
+
+    pub fn deserialize<'de, T: TryFrom<Vec<u8>>, D: Deserializer<'de>>(
+        deserializer: D,
+    ) -> Result<T, D::Error> {
+        let bytes = deserializer.deserialize_byte_buf(BytesVisitor)?;
+        let len = bytes.len();
+        T::try_from(bytes).map_err(|_| de::Error::invalid_length(len, &"bytes of the field size"))
+    }
+
+    struct BytesVisitor;
+
+    impl<'de> Visitor<'de> for BytesVisitor {
+        type Value = Vec<u8>;
+
+        fn expecting(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+            f.write_str("bytes")
+        }
+
+        fn visit_bytes<E: de::Error>(self, v: &[u8]) -> Result<Vec<u8>, E> {
+            Ok(v.to_vec())
+        }
+
+        fn visit_byte_buf<E: de::Error>(self, v: Vec<u8>) -> Result<Vec<u8>, E> {
+            Ok(v)
+        }
+
+        fn visit_seq<A: SeqAccess<'de>>(self, mut seq: A) -> Result<Vec<u8>, A::Error> {
+            let mut bytes = Vec::with_capacity(seq.size_hint().unwrap_or(0));
+            while let Some(byte) = seq.next_element()? {
+                bytes.push(byte);
+            }
+            Ok(bytes)
+        }
+    }
+}
+
+/// Compress large msgpack blob of a list or a map before storing it in DHT
+///
+/// Small blobs and blobs which do not get smaller are returned unchanged
+pub fn compress_blob(data: Vec<u8>) -> Vec<u8> {
+    if data.len() <= COMPRESS_THRESHOLD {
+        return data;
+    }
+
+    match zstd::bulk::compress(&data, ZSTD_LEVEL) {
+        Ok(compressed) if compressed.len() + 1 < data.len() => {
+            let mut blob = Vec::with_capacity(compressed.len() + 1);
+            blob.push(ZSTD_TAG);
+            blob.extend_from_slice(&compressed);
+            blob
+        }
+        _ => data,
+    }
+}
+
+/// Reverse of `compress_blob`, plain blobs are borrowed without copy
+///
+/// Output larger than `MAX_DECOMPRESSED_BYTES` is an error
+pub fn decompress_blob(data: &[u8]) -> Result<Cow<'_, [u8]>, SerializationError> {
+    match data.split_first() {
+        Some((&ZSTD_TAG, compressed)) => {
+            let mut decompressed = Vec::new();
+            zstd::stream::Decoder::new(compressed)?
+                .take(MAX_DECOMPRESSED_BYTES + 1)
+                .read_to_end(&mut decompressed)?;
+
+            if decompressed.len() as u64 > MAX_DECOMPRESSED_BYTES {
+                return Err(io::Error::new(
+                    io::ErrorKind::InvalidData,
+                    "decompressed blob exceeds size limit",
+                )
+                .into());
+            }
+            Ok(Cow::Owned(decompressed))
+        }
+        _ => Ok(Cow::Borrowed(data)),
+    }
+}